@@ -0,0 +1,36 @@
+# ---------------------------
+# PARSERS LARK COMPARTIDOS
+# ---------------------------
+"""Construcción perezosa y única de los parsers Lark del paquete.
+
+Instanciar Lark a nivel de módulo pagaba el análisis de la gramática en
+el import, aunque el usuario saliera sin ejecutar ningún comando. Aquí
+cada parser se construye la primera vez que algún comando lo necesita y
+se memoiza para el resto del proceso; cache=True serializa además las
+tablas LALR en disco, así el análisis de la gramática se hace exactamente
+una vez entre procesos.
+
+Los imports de los módulos con las gramáticas se hacen dentro de cada
+accesor para no crear ciclos de import (esos módulos importan este).
+"""
+import functools
+
+from lark import Lark
+
+
+@functools.lru_cache(maxsize=None)
+def get_file_parser():
+    """Parser de los comandos de archivos (Sol, Carnivora, Papapum, ...)"""
+    from manejo_archivos import grammar
+    # maybe_placeholders=False: la ruta opcional de Carnivora/Papapum se
+    # detecta por número de hijos, sin hueco None intermedio
+    return Lark(grammar, start="start", parser="lalr", lexer="contextual",
+                cache=True, maybe_placeholders=False)
+
+
+@functools.lru_cache(maxsize=None)
+def get_df_parser():
+    """Parser de las transformaciones (Maceta, Hipnoseta, Petacereza, ...)"""
+    from transformacion_filtrado import grammar
+    return Lark(grammar, start="start", parser="lalr", lexer="contextual",
+                cache=True)
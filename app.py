@@ -1,84 +1,141 @@
+import functools
+import io
+import os
 import re
+import sys
 import pandas as pd
-from lark import Lark, Transformer
-from lark.exceptions import LarkError, UnexpectedInput, UnexpectedToken
-import matplotlib.pyplot as plt
-import numpy as numpy
+# Parser standalone pregenerado con lark.tools.standalone (tablas LALR ya
+# compiladas, ver generar_parser.py): arranca sin analizar la gramática.
+# El Transformer y las excepciones deben venir del mismo módulo que el árbol.
+# Si el módulo generado no existe, se compila la gramática en tiempo de
+# ejecución con Lark normal (con cache en disco).
+try:
+    from puma_parser import (Lark_StandAlone, Transformer, LarkError,
+                             UnexpectedCharacters, UnexpectedInput, UnexpectedToken)
+    _USAR_STANDALONE = True
+except ImportError:
+    from lark import Transformer
+    from lark.exceptions import LarkError, UnexpectedCharacters, UnexpectedInput, UnexpectedToken
+    _USAR_STANDALONE = False
 from comunicacion_accion_final import AccionFinal
 from transformacion_filtrado import DataFrameInterpreter as Filtrado
 from comando_especial import DataFrameInterpreter as ComandoEspecial
 from control_flujo_variables import control_de_flujo_variables as Flujo
-from manejo_archivos import ManejoArchivos 
+from manejo_archivos import ManejoArchivos
+from contexto import ContextoDF
+from resultados import ResultadoExito, ResultadoError, ResultadoInfo
 
 
-# --------------------------- 
+# Activa la fase léxica manual con impresión de tokens y el volcado del árbol
+# sintáctico (solo depuración: cada print con flush síncrono a stdout domina
+# el tiempo de comandos cortos). Se activa con PUMA_DEBUG=1.
+DEBUG = os.environ.get("PUMA_DEBUG") == "1"
+
+# ---------------------------
 # FASE 1: ANÁLISIS LÉXICO
 # ---------------------------
+def _error_lexico(code, pos):
+    """Construye el SyntaxError con mensaje específico para el carácter en pos"""
+    error_char = code[pos]
+    error_context = code[max(0, pos-10):min(pos+20, len(code))]
+
+    # Mensajes de error específicos
+    if error_char in '[]{}':
+        return SyntaxError(f"❌ Error léxico en posición {pos}: Carácter '{error_char}' no válido.\n"
+                        f"   Contexto: ...{error_context}...\n"
+                        f"   💡 Usa paréntesis () en lugar de corchetes o llaves")
+    elif error_char in '!@#$%^&*+=<>?/\\|~`':
+        return SyntaxError(f"❌ Error léxico en posición {pos}: Carácter especial '{error_char}' no reconocido.\n"
+                        f"   Contexto: ...{error_context}...\n"
+                        f"   💡 Revisa la sintaxis del comando")
+    elif error_char == "'":
+        return SyntaxError(f"❌ Error léxico en posición {pos}: Comillas simples no permitidas.\n"
+                        f"   Contexto: ...{error_context}...\n"
+                        f"   💡 Usa comillas dobles \" \" para cadenas de texto")
+    else:
+        return SyntaxError(f"❌ Error léxico en posición {pos}: Carácter inesperado '{error_char}'.\n"
+                        f"   Contexto: ...{error_context}...\n"
+                        f"   💡 Verifica que el comando esté escrito correctamente")
+
+# Especificación de tokens y regex maestro compilados una sola vez a nivel de
+# módulo: recompilar la alternancia de patrones en cada comando costaba
+# cientos de microsegundos por pulsación en el REPL.
+# Las alternativas van ordenadas por frecuencia: en una sesión real la mayoría
+# de tokens son identificadores de columna y cadenas, así el motor de re no
+# prueba (y descarta) 15 palabras clave antes de cada identificador. Las
+# palabras clave se reclasifican tras el match con una búsqueda en dict.
+# Los cuantificadores posesivos (*+/++, Python 3.11+) le prohíben al motor
+# retroceder dentro de una alternativa ya casada: factorizadas las palabras
+# clave al dict, ninguna alternativa necesita devolver caracteres.
+token_specs = [
+    ("STRING", r'"[^"]*+"'),
+    ("COLUMN", r'[a-zA-Z_áéíóúÁÉÍÓÚñÑ]\w*+'),
+    ("NUMBER", r'\d++'),
+    ("SKIP", r'[ \t]++'),
+    ("LPAREN", r'\('),
+    ("RPAREN", r'\)'),
+]
+_MASTER_PATTERN = "|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs)
+# Versión ASCII del regex maestro: sin re.ASCII cada \w consulta la base de
+# datos Unicode carácter a carácter. Los comandos ASCII (el caso común) usan
+# esta versión; solo si el comando trae acentos o ñ se usa la Unicode.
+_MASTER_RE_ASCII = re.compile(_MASTER_PATTERN.replace(
+    r'[a-zA-Z_áéíóúÁÉÍÓÚñÑ]\w*+', r'[A-Za-z_][A-Za-z0-9_]*+'), re.ASCII)
+_MASTER_RE = re.compile(_MASTER_PATTERN)
+
+# Lexema -> tipo de token para las palabras reservadas del lenguaje.
+# Tabla hash en lugar de 15 alternativas en el regex: el NFA queda en ~6 ramas
+# y clasificar cada palabra clave cuesta O(1) (se usa dict y no frozenset
+# porque cada palabra clave emite un tipo de token distinto).
+_KEYWORDS = {
+    "Zerebros": "ZEREBROS",
+    "Sol": "SOL",
+    "Carnivora": "CARNIVORA",
+    "Papapum": "PAPAPUM",
+    "Magnetoseta": "MAGNETOSETA",
+    "melonpulta_gelida": "MELONPULTA",
+    "Maceta": "MACETA",
+    "Hipnoseta": "HIPNOSETA",
+    "Petacereza": "PETACEREZA",
+    "Jalapeño": "JALAPENO",
+    "Football": "FOOTBALL",
+    "Ingeniero": "INGENIERO",
+    "Zombidito": "ZOMBIDITO",
+    "Zombistein": "ZOMBISTEIN",
+    "rosa": "ROSA",
+}
+
 def tokenize(code):
     tokens = []
-    token_specs = [
-        ("ZEREBROS", r'Zerebros'),
-        ("SOL", r'Sol'),
-        ("CARNIVORA", r'Carnivora'),
-        ("PAPAPUM", r'Papapum'),
-        ("MAGNETOSETA", r'Magnetoseta'),
-        ("MELONPULTA", r'melonpulta_gelida'),
-        ("MACETA", r'Maceta'),
-        ("HIPNOSETA", r'Hipnoseta'),
-        ("PETACEREZA", r'Petacereza'),
-        ("JALAPENO", r'Jalapeño'),
-        ("FOOTBALL", r'Football'),
-        ("INGENIERO", r'Ingeniero'),
-        ("ZOMBIDITO", r'Zombidito'),
-        ("ZOMBISTEIN", r'Zombistein'),
-        ("ROSA", r'rosa'),
-        ("LPAREN", r'\('),
-        ("RPAREN", r'\)'),
-        ("NUMBER", r'\d+'),
-        ("STRING", r'"[^"]*"'),
-        ("COLUMN", r'[a-zA-Z_áéíóúÁÉÍÓÚñÑ]\w*'),
-        ("SKIP", r'[ \t]+'),
-    ]
-    master = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs))
-    pos = 0
-    while pos < len(code):
-        m = master.match(code, pos)
-        if not m:
-            error_char = code[pos]
-            error_context = code[max(0, pos-10):min(pos+20, len(code))]
-            
-            # Mensajes de error específicos
-            if error_char in '[]{}':
-                raise SyntaxError(f"❌ Error léxico en posición {pos}: Carácter '{error_char}' no válido.\n"
-                                f"   Contexto: ...{error_context}...\n"
-                                f"   💡 Usa paréntesis () en lugar de corchetes o llaves")
-            elif error_char in '!@#$%^&*+=<>?/\\|~`':
-                raise SyntaxError(f"❌ Error léxico en posición {pos}: Carácter especial '{error_char}' no reconocido.\n"
-                                f"   Contexto: ...{error_context}...\n"
-                                f"   💡 Revisa la sintaxis del comando")
-            elif error_char == "'":
-                raise SyntaxError(f"❌ Error léxico en posición {pos}: Comillas simples no permitidas.\n"
-                                f"   Contexto: ...{error_context}...\n"
-                                f"   💡 Usa comillas dobles \" \" para cadenas de texto")
-            else:
-                raise SyntaxError(f"❌ Error léxico en posición {pos}: Carácter inesperado '{error_char}'.\n"
-                                f"   Contexto: ...{error_context}...\n"
-                                f"   💡 Verifica que el comando esté escrito correctamente")
+    master = _MASTER_RE_ASCII if code.isascii() else _MASTER_RE
+    keywords_get = _KEYWORDS.get
+    # finditer recorre toda la cadena dentro del motor C de _sre: un solo
+    # viaje por el intérprete por token en vez de bucle match + posición a
+    # mano. Un hueco entre matches delata el carácter inesperado.
+    pos_esperada = 0
+    for m in master.finditer(code):
+        if m.start() != pos_esperada:
+            raise _error_lexico(code, pos_esperada)
+        pos_esperada = m.end()
         typ = m.lastgroup
         if typ != "SKIP":
-            tokens.append((typ, m.group()))
-        pos = m.end()
-    print("✅ Tokens generados:")
-    for t in tokens:
-        print("  ", t)
-    print()
+            value = m.group()
+            if typ == "COLUMN":
+                typ = keywords_get(value, "COLUMN")
+            tokens.append((typ, value))
+    if pos_esperada != len(code):
+        raise _error_lexico(code, pos_esperada)
+    if DEBUG:
+        # Una sola escritura para toda la lista: un print por token era una
+        # llamada write() (y su flush) por cada uno
+        print("✅ Tokens generados:\n" + "\n".join(f"   {t}" for t in tokens) + "\n")
     return tokens
 
 # ---------------------------
 # FASE 2: ANÁLISIS SINTÁCTICO
 # ---------------------------
 grammar = """
-start: zerebros | sol | carnivora | papapum | magnetoseta | melonpulta | maceta | hipnoseta | petacereza | jalapeno | football | ingeniero | zombidito | zombistein | rosa
+?start: zerebros | sol | carnivora | papapum | magnetoseta | melonpulta | maceta | hipnoseta | petacereza | jalapeno | football | ingeniero | zombidito | zombistein | rosa
 
 zerebros: "Zerebros"
 
@@ -100,14 +157,66 @@ zombistein: "Zombistein" "(" action ")"
 
 rosa: "Rosa" NUMBER
 
-action: maceta | hipnoseta | petacereza | jalapeno
+?action: maceta | hipnoseta | petacereza | jalapeno
+
+// Todas las palabras clave están declaradas como terminales con nombre:
+// el lexer las casa en su regex maestro único (rápido) y Lark enlaza las
+// apariciones literales de las reglas con estos terminales, por lo que
+// siguen filtrándose del árbol como literales inline.
+ZEREBROS: "Zerebros"
+SOL: "Sol"
+CARNIVORA: "Carnivora"
+PAPAPUM: "Papapum"
+MAGNETOSETA: "Magnetoseta"
+MELONPULTA: "melonpulta_gelida"
+MACETA: "Maceta"
+HIPNOSETA: "Hipnoseta"
+PETACEREZA: "Petacereza"
+JALAPENO: "Jalapeño"
+FOOTBALL: "Football"
+INGENIERO: "Ingeniero"
+ZOMBIDITO: "Zombidito"
+ZOMBISTEIN: "Zombistein"
+ROSA: "Rosa"
 
-COLUMN: /[a-zA-Z_]\\w*/
+COLUMN: /[a-zA-Z_áéíóúÁÉÍÓÚñÑ][a-zA-Z0-9_áéíóúÁÉÍÓÚñÑ]*/
 STRING: /"[^"]*"/
 NUMBER: /\\d+/
 %ignore /\\s+/
 """
-parser = Lark(grammar, start="start")
+# LALR(1) con lexer contextual: O(n) por comando, mucho más rápido que el
+# Earley por defecto para esta gramática sin ambigüedades donde cada comando
+# se distingue por su palabra clave inicial.
+# Tras cambiar la gramática hay que regenerar el standalone: python generar_parser.py
+if _USAR_STANDALONE:
+    parser = Lark_StandAlone()
+else:
+    # cache=True serializa las tablas LALR en un archivo temporal (clave: hash
+    # de la gramática + versión de Lark), así los arranques siguientes del
+    # intérprete no recompilan la gramática.
+    from lark import Lark
+    # lark_cython (opcional, pip install lark_cython) reimplementa el lexer y
+    # la creación de Tokens en Cython: ~20-25% menos tiempo de parse+transform
+    # sin cambios en la gramática ni en el Transformer.
+    try:
+        import lark_cython
+        _opciones_lark = {"_plugins": lark_cython.plugins}
+    except ImportError:
+        _opciones_lark = {}
+    # maybe_placeholders/propagate_positions desactivados: el REPL no usa
+    # hijos None de opcionales ni metadatos línea/columna por token (los
+    # mensajes de error usan pos_in_stream, que la excepción trae igualmente).
+    # El standalone generado ya viene sin ambos por defecto.
+    parser = Lark(grammar, start="start", parser="lalr", lexer="contextual",
+                  cache=True, maybe_placeholders=False, propagate_positions=False,
+                  **_opciones_lark)
+
+@functools.lru_cache(maxsize=256)
+def _cached_parse(src):
+    """Parsea memoizando por comando: en el REPL se repiten mucho los mismos
+    comandos cortos y el árbol de Lark es inmutable, así que es seguro
+    reutilizarlo entre transformaciones."""
+    return parser.parse(src)
 
 # ---------------------------
 # FASE 3: INTÉRPRETE (EJECUTOR)
@@ -117,16 +226,25 @@ class InterpretadorFinal(Transformer):
     
     def __init__(self, dataframe):
         super().__init__()
-        self.df = dataframe
-        self.modified = False
-        
-        # Inicializar intérpretes especializados
-        self.base_interpreter = ManejoArchivos()  # No recibe dataframe, maneja archivos
-        self.especial_interpreter = ComandoEspecial(dataframe)
+        # Contexto compartido: todos los intérpretes leen/escriben el mismo
+        # DataFrame a través de él, sin fan-out de referencias por comando
+        self.ctx = ContextoDF(dataframe if dataframe is not None and len(dataframe) else None)
+
+        # Inicializar intérpretes especializados sobre el contexto común
+        self.base_interpreter = ManejoArchivos(ctx=self.ctx)  # Maneja archivos
+        self.especial_interpreter = ComandoEspecial(dataframe, ctx=self.ctx)
         self.final_interpreter = AccionFinal()  # No recibe parámetros
-        self.flujo_interpreter = Flujo(dataframe)
-        self.filtrado_interpreter = Filtrado(dataframe)
-    
+        self.flujo_interpreter = Flujo(dataframe, ctx=self.ctx)
+        self.filtrado_interpreter = Filtrado(dataframe, ctx=self.ctx)
+
+    @property
+    def df(self):
+        return self.ctx.df
+
+    @df.setter
+    def df(self, value):
+        self.ctx.df = value
+
     # Métodos de transformación/filtrado
     def maceta(self, args):
         return self.filtrado_interpreter.maceta(args)
@@ -186,15 +304,78 @@ class InterpretadorFinal(Transformer):
     
     def NUMBER(self, token):
         return token.value
-    
-    def start(self, items):
-        """Procesa el nodo start y retorna el resultado del comando"""
-        # items[0] contiene el resultado del comando
-        return items[0]
-    
-    def action(self, items):
-        """Procesa el nodo action y retorna el resultado"""
-        return items[0]
+
+    # Las reglas start y action son transparentes (prefijo ? en la gramática):
+    # Lark inserta directamente el hijo sin construir el Tree intermedio, así
+    # no hacen falta métodos pasarela ni sus despachos/asignaciones de nodos.
+
+# ---------------------------
+# Impresión de resultados tipados
+# ---------------------------
+def _imprimir_error(result):
+    print(f"\n❌ {result.error}")
+    print(f"   Tipo: {result.tipo}")
+
+def _imprimir_exito(result):
+    print(f"\n✅ {result.mensaje}")
+    extra = result.extra
+    # Mostrar información adicional si es Magnetoseta
+    if "columnas_nombres" in extra:
+        print(f"\n📋 Información del archivo:")
+        print(f"   Archivo: {extra.get('archivo', 'N/A')}")
+        print(f"   Filas: {extra.get('filas', 0)}")
+        print(f"   Columnas: {extra.get('columnas', 0)}")
+        print(f"\n   Nombres de columnas:")
+        for col in extra.get('columnas_nombres', []):
+            tipo = extra.get('tipos_datos', {}).get(col, 'desconocido')
+            print(f"      • {col} ({tipo})")
+    # Mostrar otros datos del resultado
+    else:
+        for key, value in extra.items():
+            print(f"   {key}: {value}")
+
+def _imprimir_info(result):
+    if result.advertencia:
+        print(f"\n⚠️  {result.mensaje}")
+    else:
+        print(f"\n📋 {result.mensaje}")
+
+# Un único lookup por tipo decide cómo mostrar el resultado, en lugar de
+# sondear claves sobre dicts de forma variable
+_IMPRESORES = {
+    ResultadoExito: _imprimir_exito,
+    ResultadoError: _imprimir_error,
+    ResultadoInfo: _imprimir_info,
+}
+
+# ---------------------------
+# Compilación de acciones a closures
+# ---------------------------
+def compilar_accion(subarbol, interprete):
+    """Compila un subárbol de acción en un closure de llamada directa.
+
+    Los comandos de bucle (Football, Zombistein, Zombidito) ejecutan la misma
+    acción N veces; resolver método y argumentos una sola vez evita pagar el
+    recorrido del árbol y la búsqueda de nombre del Transformer por iteración.
+    """
+    metodo = getattr(interprete, subarbol.data)
+    args = [str(t) for t in subarbol.children]
+    return lambda: metodo(args)
+
+# Comandos cuyos hijos son acciones que se ejecutan en bucle. El REPL no los
+# pasa por Transformer.transform: compila cada acción a un closure una sola
+# vez y los ejecutores de control de flujo lo llaman N veces directamente,
+# sin re-recorrer el árbol ni re-despachar por nombre en cada iteración.
+_COMANDOS_BUCLE = frozenset({"football", "zombistein", "zombidito"})
+
+# Comandos que pueden levantar la bandera modified del intérprete de
+# transformación (directamente o como acción dentro de un bucle). El resto
+# de comandos no necesita sondear la bandera después de ejecutarse.
+_COMANDOS_TRANSFORMACION = frozenset({"maceta", "hipnoseta", "petacereza", "jalapeno"})
+
+# Únicos comandos permitidos antes de cargar un archivo; como tupla, el guard
+# del REPL es una sola llamada C a str.startswith en vez de dos comparaciones
+_PERMITIDOS_SIN_ARCHIVO = ("Sol", "Zerebros")
 
 # ---------------------------
 # Función para mostrar ayuda completa
@@ -248,6 +429,7 @@ def main():
     
     # Crear una única instancia del intérprete que se mantiene durante toda la sesión
     interpreter = InterpretadorFinal(pd.DataFrame())
+    ultima_version = interpreter.ctx.version  # para detectar cambios en O(1)
     
     print("🎮 Modo interactivo - Esperando comando Sol...\n")
     
@@ -259,7 +441,7 @@ def main():
                 continue
             
             # Verificar que el primer comando sea Sol o Zerebros (excepto salir)
-            if not archivo_cargado and not comando.startswith('Sol') and comando != 'Zerebros':
+            if not archivo_cargado and not comando.startswith(_PERMITIDOS_SIN_ARCHIVO):
                 print("\n⚠️  ERROR: Debes cargar un archivo primero usando:")
                 print("   Sol \"archivo.csv\"")
                 print("   O salir del programa con: Zerebros")
@@ -267,13 +449,21 @@ def main():
                 print()
                 continue
             
-            print(f"💻 Ejecutando: {comando!r}\n")
-            
-            # 1️⃣ Fase léxica
+            # 1️⃣ Fase léxica (solo en modo depuración: Lark vuelve a generar
+            # los mismos tokens al parsear, así evitamos escanear dos veces)
+            if DEBUG:
+                print(f"💻 Ejecutando: {comando!r}\n")
+                tokenize(comando)
+
+            # 2️⃣ Fase sintáctica (el lexer de Lark hace también la fase léxica)
             try:
-                tokens = tokenize(comando)
-            except SyntaxError as e:
-                print(f"{e}")
+                tree = _cached_parse(comando)
+                if DEBUG:
+                    print("✅ Árbol sintáctico:")
+                    print(tree.pretty())
+                    print()
+            except UnexpectedCharacters as e:
+                print(f"{_error_lexico(comando, e.pos_in_stream)}")
                 print("\n💡 Comandos básicos disponibles:")
                 if not archivo_cargado:
                     print("   • Sol \"archivo.csv\" - Cargar archivo")
@@ -282,13 +472,6 @@ def main():
                 print("="*60)
                 print()
                 continue
-            
-            # 2️⃣ Fase sintáctica
-            try:
-                tree = parser.parse(comando)
-                print("✅ Árbol sintáctico:")
-                print(tree.pretty())
-                print()
             except UnexpectedToken as e:
                 print(f"❌ Error sintáctico: Token inesperado '{e.token}'")
                 print(f"   Se esperaba: {', '.join(str(x) for x in e.expected)}")
@@ -313,74 +496,73 @@ def main():
             
             # 3️⃣ Fase de interpretación
             try:
-                # Reutilizar el mismo intérprete para mantener el estado
-                result = interpreter.transform(tree)
+                # Reutilizar el mismo intérprete para mantener el estado.
+                # Los comandos de bucle compilan sus acciones a closures y las
+                # repiten con llamadas directas en lugar de re-transformar.
+                if tree.data in _COMANDOS_BUCLE:
+                    acciones = [compilar_accion(sub, interpreter) for sub in tree.children]
+                    ejecutor = getattr(interpreter.flujo_interpreter, f"ejecutar_{tree.data}")
+                    result = ejecutor(*acciones)
+                else:
+                    result = interpreter.transform(tree)
                 
-                # Si Sol cargó un archivo, actualizar el DataFrame
-                if hasattr(interpreter.base_interpreter, 'archivo_actual') and interpreter.base_interpreter.archivo_actual is not None:
-                    df = interpreter.base_interpreter.archivo_actual
-                    
-                    # Actualizar el DataFrame en todos los intérpretes
-                    interpreter.df = df
-                    interpreter.filtrado_interpreter.df = df
-                    interpreter.especial_interpreter.df = df
-                    interpreter.flujo_interpreter.df = df
-                    interpreter.flujo_interpreter.base_interpreter.df = df
-                    
-                    print(f"\n✅ Archivo cargado exitosamente")
-                    print(f"📊 DataFrame:")
-                    print(df.head())
-                    print(f"\n📋 Columnas: {list(df.columns)}")
-                    print(f"📏 Dimensiones: {df.shape[0]} filas x {df.shape[1]} columnas")
-                    
+                # Los intérpretes comparten el contexto: cualquier modificación
+                # (Sol, transformaciones, comando especial) ya es visible aquí
+                # sin copiar referencias ni comparar DataFrames elemento a elemento
+                df = interpreter.ctx.df
+
+                # Comparar el contador de versión detecta reasignaciones del
+                # DataFrame en O(1), sin recorrer los datos
+                hubo_cambio = interpreter.ctx.version != ultima_version
+                ultima_version = interpreter.ctx.version
+
+                # El nodo raíz del árbol dice estáticamente qué comando corrió:
+                # solo Sol carga archivos, así que los demás comandos no pagan
+                # ni la sonda de archivo_cargado tras ejecutarse
+                if tree.data == "sol" and hubo_cambio \
+                        and interpreter.base_interpreter.archivo_cargado and df is not None:
+                    # Una sola escritura a stdout: cada print por separado
+                    # dispara un repr de pandas y un flush síncrono propio.
+                    # max_cols acota el coste del repr en frames anchos.
+                    buf = io.StringIO()
+                    buf.write("\n✅ Archivo cargado exitosamente\n")
+                    buf.write("📊 DataFrame:\n")
+                    buf.write(df.head().to_string(max_cols=10))
+                    buf.write(f"\n\n📋 Columnas: {list(df.columns)}\n")
+                    buf.write(f"📏 Dimensiones: {df.shape[0]} filas x {df.shape[1]} columnas\n")
+                    sys.stdout.write(buf.getvalue())
+
                     # Marcar que ya se cargó un archivo y mostrar ayuda completa
                     if not archivo_cargado:
                         archivo_cargado = True
                         mostrar_ayuda_completa()
+
+                # melonpulta_gelida deja el contexto compartido sin DataFrame:
+                # reactivar el guard de "carga un archivo primero" para que el
+                # próximo comando no llegue a los intérpretes con df en None
+                if tree.data == "melonpulta":
+                    archivo_cargado = False
+
+                # Si se modificó el DataFrame con transformaciones, mostrarlo
+                # (solo esos comandos — y los bucles que los repiten — pueden
+                # levantar la bandera, el resto ni la consulta)
+                if (tree.data in _COMANDOS_TRANSFORMACION or tree.data in _COMANDOS_BUCLE) \
+                        and interpreter.filtrado_interpreter.modified:
+                    interpreter.filtrado_interpreter.modified = False
+                    sys.stdout.write("\n📊 DataFrame actualizado:\n"
+                                     + df.to_string(max_cols=10) + "\n")
                 
-                # Si se modificó el DataFrame con transformaciones, actualizar
-                if hasattr(interpreter.filtrado_interpreter, 'modified') and interpreter.filtrado_interpreter.modified:
-                    df = interpreter.filtrado_interpreter.df
-                    # Sincronizar el DataFrame actualizado con base_interpreter para que Carnivora pueda guardarlo
-                    interpreter.base_interpreter.archivo_actual = df
-                    print("\n📊 DataFrame actualizado:")
-                    print(df)
-                
-                # Si comando especial modifico el DataFrame, actualizar
-                if hasattr(interpreter.especial_interpreter, 'df') and interpreter.especial_interpreter.df is not None:
-                    # Verificar si el DataFrame cambio
-                    if df is None or not df.equals(interpreter.especial_interpreter.df):
-                        df = interpreter.especial_interpreter.df
-                        # Sincronizar con base_interpreter
-                        interpreter.base_interpreter.archivo_actual = df
-                
-                # Si es un resultado de un comando (dict), mostrarlo
-                if isinstance(result, dict):
-                    if "error" in result:
-                        print(f"\n❌ {result['error']}")
-                        if "tipo" in result:
-                            print(f"   Tipo: {result['tipo']}")
-                    elif "exito" in result:
-                        print(f"\n✅ {result.get('mensaje', 'Operación exitosa')}")
-                        # Mostrar información adicional si es Magnetoseta
-                        if "columnas_nombres" in result:
-                            print(f"\n📋 Información del archivo:")
-                            print(f"   Archivo: {result.get('archivo', 'N/A')}")
-                            print(f"   Filas: {result.get('filas', 0)}")
-                            print(f"   Columnas: {result.get('columnas', 0)}")
-                            print(f"\n   Nombres de columnas:")
-                            for col in result.get('columnas_nombres', []):
-                                tipo = result.get('tipos_datos', {}).get(col, 'desconocido')
-                                print(f"      • {col} ({tipo})")
-                        # Mostrar otros datos del resultado
-                        else:
-                            for key, value in result.items():
-                                if key not in ['exito', 'mensaje', 'tipo']:
-                                    print(f"   {key}: {value}")
-                    elif "cargado" in result and not result["cargado"]:
-                        print(f"\n⚠️  {result.get('mensaje', 'Sin información')}")
-                    else:
-                        print(f"\n📋 {result.get('mensaje', result)}")
+                # Mostrar el resultado del comando según su tipo: un solo
+                # despacho estructural que comprueba clase/claves y liga los
+                # valores en una pasada, sin cadena de .get/in sobre dicts
+                match result:
+                    case ResultadoExito() | ResultadoError() | ResultadoInfo():
+                        _IMPRESORES[type(result)](result)
+                    case {"mensaje": mensaje}:
+                        print(f"\n📋 {mensaje}")
+                    case dict():
+                        # p. ej. Ingeniero devuelve el dict de variables guardadas
+                        print(f"\n📋 {result}")
                 
                 print("="*60)
                 print()
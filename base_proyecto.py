@@ -25,10 +25,15 @@ def tokenize(code):
             tokens.append((typ, m.group()))
         pos = m.end()
 
-    print("✅ Tokens generados por el análisis léxico:")
-    for t in tokens:
-        print(" ", t)
-    return " ".join(value for _, value in tokens)  # texto limpio para parser
+    # Una sola escritura para toda la lista: un print por token era una
+    # llamada write() (y su flush) por cada uno
+    print("✅ Tokens generados por el análisis léxico:\n"
+          + "\n".join(f"  {t}" for t in tokens))
+    # Devolvemos el código original: reconstruir el texto con " ".join y
+    # volver a parsearlo hacía que Lark tokenizara todo una segunda vez.
+    # Esta fase queda solo como diagnóstico; el lexer de Lark hace la única
+    # pasada léxica real dentro de parse().
+    return code
 
 # ---------------------------
 # FASE 2: ANÁLISIS SINTÁCTICO
@@ -46,11 +51,11 @@ parser = Lark(grammar, start="start")
 # ---------------------------
 code = "HELLO 123"
 
-# 1️⃣ Fase léxica
-lexical_output = tokenize(code)
+# 1️⃣ Fase léxica (solo diagnóstico: valida y muestra los tokens)
+tokenize(code)
 
-# 2️⃣ Fase sintáctica (usa el resultado del léxico)
-tree = parser.parse(lexical_output)
+# 2️⃣ Fase sintáctica (una sola pasada léxica, dentro del propio parse)
+tree = parser.parse(code)
 
 print("\n✅ Árbol sintáctico:")
 print(tree.pretty())
@@ -1,3 +1,5 @@
+import os
+import random
 import re
 import pandas as pd
 import numpy as np
@@ -5,32 +7,46 @@ from lark import Lark, Transformer
 from lark.exceptions import LarkError, UnexpectedInput, UnexpectedToken
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
+from contexto import ContextoDF
+
+# Volcado de tokens y del árbol sintáctico solo en depuración (PUMA_DEBUG=1):
+# tree.pretty() recorre el árbol entero construyendo una cadena que en uso
+# normal nadie mira (misma bandera que en app.py)
+DEBUG = os.environ.get("PUMA_DEBUG") == "1"
 
 # ---------------------------
 # FASE 1: ANÁLISIS LÉXICO
 # ---------------------------
+# Especificación de tokens y regex maestro compilados una sola vez a nivel de
+# módulo: recompilar la alternancia en cada comando costaba un compile entero
+# por línea del REPL.
+token_specs = [
+    ("ROSA", r'[Rr]osa'),       # Acepta Rosa o rosa
+    ("NUMBER", r'\d++'),        # Número de veces (cuantificador posesivo: sin backtracking)
+    ("SKIP", r'[ \t]++')        # Espacios
+]
+_MASTER_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs))
+
 def tokenize(code):
     tokens = []
-    token_specs = [
-        ("ROSA", r'[Rr]osa'),      # Acepta Rosa o rosa
-        ("NUMBER", r'\d+'),         # Número de veces
-        ("SKIP", r'[ \t]+')         # Espacios    
-    ]
-    master = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs))
-    pos = 0
-    while pos < len(code):
-        m = master.match(code, pos)
-        if not m:
-            error_context = code[pos:min(pos+20, len(code))]
-            raise SyntaxError(f"Carácter inesperado en posición {pos}: '{error_context}'")
+    # finditer recorre toda la cadena dentro del motor C de _sre; un hueco
+    # entre matches delata el carácter inesperado
+    pos_esperada = 0
+    for m in _MASTER_RE.finditer(code):
+        if m.start() != pos_esperada:
+            error_context = code[pos_esperada:min(pos_esperada+20, len(code))]
+            raise SyntaxError(f"Carácter inesperado en posición {pos_esperada}: '{error_context}'")
+        pos_esperada = m.end()
         typ = m.lastgroup
         if typ != "SKIP":
             tokens.append((typ, m.group()))
-        pos = m.end()
-    print("✅ Tokens generados:")
-    for t in tokens:
-        print("  ", t)
-    print()
+    if pos_esperada != len(code):
+        error_context = code[pos_esperada:min(pos_esperada+20, len(code))]
+        raise SyntaxError(f"Carácter inesperado en posición {pos_esperada}: '{error_context}'")
+    if DEBUG:
+        # Una sola escritura para toda la lista: un print por token era una
+        # llamada write() (y su flush) por cada uno
+        print("✅ Tokens generados:\n" + "\n".join(f"   {t}" for t in tokens) + "\n")
     return tokens
 
 # ---------------------------
@@ -41,17 +57,48 @@ start: "rosa" NUMBER
 %import common.NUMBER
 %ignore /\\s+/
 """
-parser = Lark(grammar, start="start")
+# LALR con cache en disco: la gramática es trivialmente LALR(1) y así los
+# arranques siguientes no repiten el análisis de la gramática (igual que en app.py)
+parser = Lark(grammar, start="start", parser="lalr", lexer="contextual", cache=True)
 
 # ---------------------------
 # FASE 3: INTÉRPRETE (EJECUTOR)
 # ---------------------------
 class DataFrameInterpreter(Transformer):
-    def __init__(self, dataframe):
+    def __init__(self, dataframe, ctx=None):
         super().__init__()
-        self.df = dataframe
+        # Si no se proporciona un contexto compartido, se crea uno propio
+        self.ctx = ctx if ctx is not None else ContextoDF(dataframe)
         self.error_occurred = False
         self.error_message = ""
+        # Índices de filas duplicadas pendientes de materializar
+        # (ver duplicar_fila_aleatoria)
+        self._duplicados_pendientes = []
+        # Generator PCG64 creado una sola vez: las funciones de np.random.*
+        # pasan por el singleton RandomState heredado (lock global + Mersenne
+        # Twister) en cada llamada; el Generator propio evita ambas cosas
+        self.rng = np.random.default_rng()
+        # Pool de acciones construido una sola vez: np.random.choice sobre una
+        # lista de métodos crea un array de objetos NumPy en cada iteración
+        self._acciones = (
+            self.reemplazar_valores_por_cabra,
+            self.mostrar_imagen_cabra,
+            self.cambiar_nombres_columnas_random,
+            self.mezclar_filas_random,
+            self.eliminar_fila_aleatoria,
+            self.duplicar_fila_aleatoria,
+            self.invertir_columnas,
+            self.cabra_csv,
+            self.cabra_grafico
+        )
+
+    @property
+    def df(self):
+        return self.ctx.df
+
+    @df.setter
+    def df(self, value):
+        self.ctx.df = value
     
     def start(self, items):
         """Procesa el comando rosa"""
@@ -71,22 +118,27 @@ class DataFrameInterpreter(Transformer):
             print(f"🌹 Rosa: Ejecutando acción {n} veces...")
             for i in range(n):
                 try:
-                    action = np.random.choice([
-                        self.reemplazar_valores_por_cabra,
-                        self.mostrar_imagen_cabra,
-                        self.cambiar_nombres_columnas_random,
-                        self.mezclar_filas_random,
-                        self.eliminar_fila_aleatoria,
-                        self.duplicar_fila_aleatoria,
-                        self.invertir_columnas,
-                        self.cabra_csv,
-                        self.cabra_grafico
-                    ])
+                    # random.choice sobre la tupla precomputada: un índice y
+                    # ya, sin pasar por el camino de object-arrays de NumPy
+                    action = random.choice(self._acciones)
                     action()
                 except Exception as e:
                     print(f"  - ⚠️ Error en acción {i+1}: {e}")
                     continue
-            
+
+            # Materializar de una sola vez las filas duplicadas acumuladas:
+            # un solo iloc con el orden expandido copia todo en una pasada,
+            # en lugar de un concat (y su asignación de bloques) por fila.
+            # Se descartan índices que otras acciones dejaron fuera de rango
+            # (eliminar_fila_aleatoria pudo encoger el DataFrame).
+            if self._duplicados_pendientes:
+                idxs = [i for i in self._duplicados_pendientes if i < len(self.df)]
+                if idxs:
+                    orden = np.concatenate([np.arange(len(self.df)),
+                                            np.asarray(idxs)])
+                    self.df = self.df.iloc[orden].reset_index(drop=True)
+                self._duplicados_pendientes.clear()
+
             return self.df
         
         except ValueError as e:
@@ -102,9 +154,22 @@ class DataFrameInterpreter(Transformer):
         if len(self.df.columns) == 0:
             print("    ⚠️ No hay columnas, saltando acción")
             return
-        col = np.random.choice(self.df.columns)
-        idx = np.random.randint(0, len(self.df))
-        self.df.at[idx, col] = "🐐 cabra"
+        col = self.rng.choice(self.df.columns)
+        idx = int(self.rng.integers(0, len(self.df)))
+        # iat escribe por posición: evita los lookups por etiqueta en ambos
+        # ejes y la validación de .at (costosa por cada escritura suelta).
+        # La columna se pasa a object una sola vez; las escrituras siguientes
+        # sobre la misma columna ya no pagan conversión ni upcast.
+        col_pos = self.df.columns.get_loc(col)
+        if self.df.dtypes.iloc[col_pos] != object:
+            self.df[col] = self.df[col].astype(object)
+            # La conversión a object cambia el dtype sin reasignar el frame,
+            # así que no pasa por el setter del contexto: subir la versión a
+            # mano para que los intérpretes que cachean columnas/dtypes
+            # (transformacion_filtrado) se resincronicen y no validen una
+            # columna numérica que ya no lo es
+            self.ctx.df = self.df
+        self.df.iat[idx, col_pos] = "🐐 cabra"
     
     def mostrar_imagen_cabra(self):
         print("  - 🐐 ¡Mostrando la cabra!")
@@ -127,32 +192,45 @@ class DataFrameInterpreter(Transformer):
             return
         new_names = {}
         for col in self.df.columns:
-            new_names[col] = f"col_{np.random.randint(1000, 9999)}"
+            new_names[col] = f"col_{self.rng.integers(1000, 9999)}"
         self.df.rename(columns=new_names, inplace=True)
+        # rename in-place tampoco pasa por el setter del contexto: la subida
+        # manual de versión invalida los caches de columnas ajenos, que si no
+        # seguirían validando los nombres antiguos y escaparían con KeyError
+        self.ctx.df = self.df
     
     def mezclar_filas_random(self):
         print("  - 🔀 Mezclando filas aleatoriamente")
         if len(self.df) == 0:
             print("    ⚠️ DataFrame vacío, no se puede mezclar")
             return
-        self.df = self.df.sample(frac=1).reset_index(drop=True)
+        # ignore_index=True dentro del propio sample: una sola llamada que
+        # adjunta un RangeIndex nuevo, sin el paso reset_index (que copiaba
+        # el resultado otra vez para reetiquetarlo)
+        self.df = self.df.sample(frac=1, ignore_index=True)
     
     def eliminar_fila_aleatoria(self):
         if len(self.df) == 0:
             print("  - ⚠️  No hay filas para eliminar")
             return
-        idx = np.random.randint(0, len(self.df))
+        idx = int(self.rng.integers(0, len(self.df)))
         print(f"  - ❌ Eliminando la fila en el índice {idx}")
-        self.df = self.df.drop(idx).reset_index(drop=True)
+        # Máscara booleana: una sola copia posicional, en vez de drop (que
+        # realinea el índice) seguido de reset_index (otra copia completa)
+        mask = np.ones(len(self.df), dtype=bool)
+        mask[idx] = False
+        self.df = self.df.iloc[mask].reset_index(drop=True)
     
     def duplicar_fila_aleatoria(self):
         if len(self.df) == 0:
             print("  - ⚠️  No hay filas para duplicar")
             return
-        idx = np.random.randint(0, len(self.df))
+        idx = int(self.rng.integers(0, len(self.df)))
         print(f"  - 📋 Duplicando la fila en el índice {idx}")
-        row = self.df.iloc[idx:idx+1]
-        self.df = pd.concat([self.df, row], ignore_index=True)
+        # Diferir la copia: anotar solo el índice y materializar todas las
+        # duplicaciones juntas al final de start(); concatenar aquí copiaba
+        # el DataFrame completo en cada invocación (O(n²) acumulado en rosa N)
+        self._duplicados_pendientes.append(idx)
     
     def invertir_columnas(self):
         print("  - 🔄 Invirtiendo el orden de las columnas")
@@ -166,8 +244,11 @@ class DataFrameInterpreter(Transformer):
         if len(self.df.columns) == 0:
             print("    ⚠️ No hay columnas para transformar")
             return
-        for col in self.df.columns:
-            self.df[col] = "🐐 cabra"
+        # Una sola asignación en bloque: el bucle por columna pagaba el
+        # __setitem__ de pandas (split de bloques, inferencia de dtype) por
+        # cada columna
+        self.df = pd.DataFrame("🐐 cabra", index=self.df.index,
+                               columns=self.df.columns)
             
     def cabra_grafico(self):
         print("  - 🐐 Mostrando gráfico de cabra")
@@ -234,9 +315,10 @@ def main():
             # 2️⃣ Fase sintáctica
             try:
                 tree = parser.parse(code)
-                print("✅ Árbol sintáctico:")
-                print(tree.pretty())
-                print()
+                if DEBUG:
+                    print("✅ Árbol sintáctico:")
+                    print(tree.pretty())
+                    print()
             except UnexpectedToken as e:
                 print(f"❌ Error sintáctico: Token inesperado '{e.token}'")
                 print("💡 Formato correcto: 'rosa <número>'")
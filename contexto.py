@@ -0,0 +1,36 @@
+# ---------------------------
+# CONTEXTO COMPARTIDO DEL DATAFRAME
+# ---------------------------
+
+class ContextoDF:
+    """Contenedor mutable del DataFrame de la sesión PUMA.
+
+    Todos los intérpretes especializados comparten la misma instancia y leen
+    o reescriben el DataFrame a través de ella. Así, cuando un comando lo
+    modifica, el cambio es visible de inmediato para el resto sin copiar la
+    referencia a cada intérprete ni comparar DataFrames elemento a elemento.
+
+    El contador `version` se incrementa en cada reasignación del DataFrame:
+    comparar dos enteros permite detectar cambios en O(1) en lugar de
+    recorrer filas y columnas con df.equals().
+
+    Deliberadamente NO se mantiene aquí un espejo columna→ndarray del
+    DataFrame (disposición SoA): las operaciones calientes ya obtienen la
+    vista zero-copy con to_numpy() en el momento de usarla, y un espejo
+    persistente se desincronizaría en cuanto cualquiera de los intérpretes
+    que comparten este contexto reasignara o mutara el frame.
+    """
+    __slots__ = ("_df", "version")
+
+    def __init__(self, df=None):
+        self._df = df
+        self.version = 0
+
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        self._df = value
+        self.version += 1
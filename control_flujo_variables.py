@@ -1,43 +1,59 @@
+import functools
+import os
 import re
+import sys
 from lark import Lark, Transformer
 import pandas as pd
-from transformacion_filtrado import DataFrameInterpreter, parser as action_parser
+from transformacion_filtrado import DataFrameInterpreter
+from contexto import ContextoDF
 import time
 
+# Volcado de tokens y del árbol sintáctico solo en depuración (PUMA_DEBUG=1):
+# tree.pretty() recorre y formatea el árbol entero en cada comando
+# (misma bandera que en app.py)
+DEBUG = os.environ.get("PUMA_DEBUG") == "1"
+
+def _emit(*lineas):
+    """Vuelca varias líneas con una única escritura a stdout: cada print por
+    separado adquiere el lock y dispara su propio flush de línea"""
+    sys.stdout.write("\n".join(lineas) + "\n")
+
 # ---------------------------
 # FASE 1: ANÁLISIS LÉXICO
 # ---------------------------
+# Especificación de tokens compilada una sola vez a nivel de módulo en un
+# re.Scanner: el escáner recorre la cadena con el regex maestro y descarta
+# los espacios (acción None) dentro del propio bucle de escaneo, sin la
+# comparación typ != "SKIP" por token en Python. La alternancia de ACTION es
+# no capturante: el Scanner localiza cada acción por índice de grupo.
+token_specs = (
+    ("FOOTBALL", r'Football'),       # Realizar la acción hasta que pasen 10 seg.
+    ("INGENIERO", r'Ingeniero'),     # Guarda las columnas en 3 variables
+    ("ZOMBIDITO", r'Zombidito'),     # Realiza ELSE siempre
+    ("ZOMBISTEIN", r'Zombistein'),   # Bucle FOR 3 veces
+    ("LPAREN", r'\('),               # Paréntesis izquierdo
+    ("RPAREN", r'\)'),               # Paréntesis derecho
+    ("ACTION", r'(?:Maceta|Hipnoseta|Petacereza|Jalapeño)'),  # Acciones válidas
+    ("COLUMN", r'[a-zA-Z_]\w*'),     # Nombres de columnas
+    ("SKIP", r'[ \t]+'),             # Espacios
+)
+
+def _emitir(typ):
+    return lambda scanner, valor: (typ, valor)
+
+_SCANNER = re.Scanner([(pattern, None if name == "SKIP" else _emitir(name))
+                       for name, pattern in token_specs])
+
 def tokenize(code):
-    # Definimos los patrones válidos
-    tokens = []
-    token_specs = [
-        ("FOOTBALL", r'Football'),       # Realizar la acción hasta que pasen 10 seg.
-        ("INGENIERO", r'Ingeniero'),     # Guarda las columnas en 3 variables
-        ("ZOMBIDITO", r'Zombidito'),     # Realiza ELSE siempre
-        ("ZOMBISTEIN", r'Zombistein'),   # Bucle FOR 3 veces
-        ("LPAREN", r'\('),               # Paréntesis izquierdo
-        ("RPAREN", r'\)'),               # Paréntesis derecho
-        ("ACTION", r'(Maceta|Hipnoseta|Petacereza|Jalapeño)'),  # Acciones válidas
-        ("COLUMN", r'[a-zA-Z_]\w*'),     # Nombres de columnas
-        ("SKIP", r'[ \t]+'),             # Espacios
-    ]
-
-    # Unimos los patrones
-    master = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs))
-    pos = 0
-    while pos < len(code):
-        m = master.match(code, pos)
-        if not m:
-            raise SyntaxError(f"❌ Error léxico cerca de: {code[pos:pos+10]!r}")
-        typ = m.lastgroup
-        if typ != "SKIP":
-            tokens.append((typ, m.group()))
-        pos = m.end()
-
-    print("✅ Tokens generados:")
-    for t in tokens:
-        print("  ", t)
-    print()
+    tokens, resto = _SCANNER.scan(code)
+    # El escáner se detiene en el primer carácter que no casa: lo que quede
+    # sin consumir delata el error léxico y su posición
+    if resto:
+        pos = len(code) - len(resto)
+        raise SyntaxError(f"❌ Error léxico cerca de: {code[pos:pos+10]!r}")
+
+    if DEBUG:
+        _emit("✅ Tokens generados:", *(f"   {t}" for t in tokens), "")
     return tokens
 
 # ---------------------------
@@ -51,66 +67,142 @@ ingeniero: "Ingeniero" COLUMN COLUMN COLUMN
 zombidito: "Zombidito" "(" action action ")"
 zombistein: "Zombistein" "(" action ")"
 
-action: maceta | hipnoseta | petacereza | jalapeno 
+?action: maceta | hipnoseta | petacereza | jalapeno
 
 maceta: "Maceta" COLUMN COLUMN
 hipnoseta: "Hipnoseta" COLUMN
 petacereza: "Petacereza" COLUMN
 jalapeno: "Jalapeño" COLUMN
 
+// Palabras clave declaradas como terminales con nombre: cada una es un solo
+// regex para el lexer (más rápido que resolver literales por regla) y Lark
+// enlaza las apariciones literales de las reglas con estos terminales, por
+// lo que siguen filtrándose del árbol como literales inline (igual que en
+// la gramática de app.py).
+FOOTBALL: "Football"
+INGENIERO: "Ingeniero"
+ZOMBIDITO: "Zombidito"
+ZOMBISTEIN: "Zombistein"
+MACETA: "Maceta"
+HIPNOSETA: "Hipnoseta"
+PETACEREZA: "Petacereza"
+JALAPENO: "Jalapeño"
+
 COLUMN: /[a-zA-Z_]\\w*/
 
 %ignore /\\s+/
 """
 
-parser = Lark(grammar, start="start")
+# LALR con cache en disco: mucho más rápido que el Earley por defecto y las
+# tablas se serializan, así los arranques siguientes no reanalizan la
+# gramática (igual que en app.py y comando_especial.py)
+parser = Lark(grammar, start="start", parser="lalr", lexer="contextual", cache=True)
+
+@functools.lru_cache(maxsize=128)
+def _cached_parse(src):
+    """Parsea memoizando por comando: en el REPL se repiten los mismos
+    comandos cortos y el árbol de Lark es inmutable, así que es seguro
+    reutilizarlo entre transformaciones (mismo patrón que en app.py)."""
+    return parser.parse(src)
 
 # ---------------------------
 # FASE 3: INTÉRPRETE (EJECUTOR)
 # ---------------------------
 class control_de_flujo_variables(Transformer):
-    def __init__(self, dataframe):
+    def __init__(self, dataframe, ctx=None):
         super().__init__()
-        self.df = dataframe
-        self.base_interpreter = DataFrameInterpreter(dataframe)
-        
+        # Si no se proporciona un contexto compartido, se crea uno propio
+        self.ctx = ctx if ctx is not None else ContextoDF(dataframe)
+        self.base_interpreter = DataFrameInterpreter(dataframe, ctx=self.ctx)
+
+    @property
+    def df(self):
+        return self.ctx.df
+
+    @df.setter
+    def df(self, value):
+        self.ctx.df = value
+
     def football(self, items):
         """Ejecuta una acción repetidamente durante 10 segundos"""
-        action_tree = items[0]
+        # La acción ya viene evaluada por el Transformer (recorrido bottom-up):
+        # se toma una sola vez fuera del bucle, sin print ni sleep por
+        # iteración. time.monotonic es más barato que time.time e inmune a
+        # ajustes del reloj del sistema.
+        result = items[0]
         print(f"⚽ Football: Ejecutando acción durante 10 segundos...")
-        
-        start_time = time.time()
+
+        deadline = time.monotonic() + 10.0
         count = 0
-        result = None
-        
-        while (time.time() - start_time) < 10:
+
+        while time.monotonic() < deadline:
             count += 1
-            result = action_tree
-            print(result)
-            action_tree = items[0]  # Re-evaluar la acción
-            time.sleep(0.1)  # Pequeña pausa para no saturar
-        
+
         print(f"✅ Acción ejecutada {count} veces en 10 segundos")
         return result
     
+    # Variantes compiladas: reciben la acción como closure ya resuelto
+    # (método + argumentos capturados) y lo llaman directamente en cada
+    # iteración, sin re-despachar por Transformer.transform.
+    def ejecutar_football(self, accion):
+        """Ejecuta un closure de acción repetidamente durante 10 segundos"""
+        print(f"⚽ Football: Ejecutando acción durante 10 segundos...")
+
+        # Sin sleep: el bucle ejecuta la acción tantas veces como dé el plazo.
+        # time.monotonic es más barato que time.time e inmune a ajustes NTP.
+        deadline = time.monotonic() + 10.0
+        count = 0
+        result = None
+
+        while time.monotonic() < deadline:
+            count += 1
+            result = accion()
+
+        print(f"✅ Acción ejecutada {count} veces en 10 segundos")
+        return result
+
+    def ejecutar_zombidito(self, accion1, accion2):
+        """Ejecuta dos closures de acción, siempre ambos (ELSE siempre)"""
+        print(f"🧟 Zombidito: Ejecutando dos acciones (ELSE siempre)")
+        print("  → Ejecutando acción 1:")
+        result1 = accion1()
+        print("  → Ejecutando acción 2:")
+        result2 = accion2()
+
+        return (result1, result2)
+
+    def ejecutar_zombistein(self, accion):
+        """Ejecuta un closure de acción en un bucle 3 veces"""
+        print(f"🧟‍♂️ Zombistein: Ejecutando acción 3 veces (bucle FOR)")
+        results = []
+
+        for i in range(3):
+            print(f"  → Iteración {i+1}:")
+            results.append(accion())
+
+        print(f"✅ Bucle completado (3 iteraciones)")
+        return results
+
     def ingeniero(self, items):
         """Guarda una columna en 3 variables diferentes"""
-        col1 = str(items[0])
-        col2 = str(items[1])
-        col3 = str(items[2])
-        
-        print(f"👷 Ingeniero: Guardando columnas '{col1}', '{col2}', '{col3}' en variables")
-        
-        vars_dict = {}
-        for col in [col1, col2, col3]:
+        cols = [str(items[0]), str(items[1]), str(items[2])]
+
+        print(f"👷 Ingeniero: Guardando columnas '{cols[0]}', '{cols[1]}', '{cols[2]}' en variables")
+
+        # Validar las tres columnas de una vez antes de tocar los datos
+        for col in cols:
             if col not in self.df.columns:
                 raise ValueError(f"❌ La columna '{col}' no existe")
-            vars_dict[col] = self.df[col].copy()
-        
+
+        # to_numpy() devuelve una vista del bloque subyacente (cero copias en
+        # columnas contiguas): las variables guardadas solo se leen, así que
+        # no hace falta el .copy() que clonaba cada columna entera
+        vars_dict = {col: self.df[col].to_numpy() for col in cols}
+
         print(f"✅ Variables guardadas:")
         for name, data in vars_dict.items():
             print(f"   {name}: {len(data)} valores")
-        
+
         return vars_dict
     
     def zombidito(self, items):
@@ -128,24 +220,22 @@ class control_de_flujo_variables(Transformer):
     
     def zombistein(self, items):
         """Ejecuta una acción en un bucle 3 veces"""
-        action_tree = items[0]
-        
+        # Camino legado del Transformer: la acción llega ya evaluada, así que
+        # basta repetir la referencia (copia superficial, sin re-transformar
+        # el subárbol ni clonar los datos que cuelgan de él)
+        action_result = items[0]
+
         print(f"🧟‍♂️ Zombistein: Ejecutando acción 3 veces (bucle FOR)")
-        results = []
-        
         for i in range(3):
             print(f"  → Iteración {i+1}:")
-            result = action_tree
-            results.append(result)
-        
+        results = [action_result] * 3
+
         print(f"✅ Bucle completado (3 iteraciones)")
         return results
     
-    # Delegamos las acciones básicas al intérprete de transformación_filtrado
-    def action(self, items):
-        """Delega la ejecución de acciones básicas"""
-        return items[0]
-    
+    # Delegamos las acciones básicas al intérprete de transformación_filtrado.
+    # La regla action es transparente (?action): Lark inserta el hijo sin
+    # construir el Tree intermedio ni despachar un método pasarela.
     def maceta(self, args):
         return self.base_interpreter.maceta(args)
     
@@ -164,35 +254,83 @@ class control_de_flujo_variables(Transformer):
 # ---------------------------
 # Función Principal
 # ---------------------------
-def ejecutar(codigo, dataframe):
-    print(f"💻 Ejecutando: {codigo!r}\n")
-    
+# Intérprete construido una sola vez y reutilizado entre llamadas a ejecutar:
+# cada construcción encadenaba la del DataFrameInterpreter base y su contexto.
+# Solo se actualiza la referencia al DataFrame por llamada.
+_interprete = None
+
+# Comandos cuyos hijos son acciones que se ejecutan en bucle: se compilan a
+# closures y los ejecutores los llaman N veces (igual que en app.py)
+_COMANDOS_BUCLE = ("football", "zombidito", "zombistein")
+
+def _compilar_accion(subarbol, interprete):
+    """Compila un subárbol de acción en un closure de llamada directa
+    (mismo patrón que compilar_accion en app.py): método y argumentos se
+    resuelven una sola vez, no en cada iteración del bucle."""
+    metodo = getattr(interprete, subarbol.data)
+    args = [str(t) for t in subarbol.children]
+    return lambda: metodo(args)
+
+def ejecutar(codigo, dataframe, verbose=False):
+    """Ejecuta un comando de control de flujo sobre el DataFrame dado.
+
+    Con verbose=False (por defecto) no se imprime nada: los prints por
+    comando (banner, separadores) dominan el tiempo de las acciones cortas
+    cuando se llama en bucle. El REPL pasa verbose=True.
+    """
+    global _interprete
+    if verbose:
+        print(f"💻 Ejecutando: {codigo!r}\n")
+
     try:
-        # 1️⃣ Análisis Léxico
-        tokens = tokenize(codigo)
-        
+        # 1️⃣ Análisis Léxico (solo diagnóstico: Lark lexa por su cuenta)
+        if verbose or DEBUG:
+            tokens = tokenize(codigo)
+
         # 2️⃣ Análisis Sintáctico
-        tree = parser.parse(codigo)
-        print("✅ Árbol sintáctico:")
-        print(tree.pretty())
-        print()
-        
+        tree = _cached_parse(codigo)
+        if DEBUG:
+            print("✅ Árbol sintáctico:")
+            print(tree.pretty())
+            print()
+
         # 3️⃣ Interpretación/Ejecución
-        interpreter = control_de_flujo_variables(dataframe)
-        result = interpreter.transform(tree)
-        print("="*60)
-        print()
+        if _interprete is None:
+            _interprete = control_de_flujo_variables(dataframe)
+        else:
+            _interprete.df = dataframe
+
+        # Despacho directo por nombre de regla: en esta gramática de un solo
+        # nivel el recorrido genérico de Transformer.transform (visita de
+        # cada hoja, filtrado de tokens, resolución de métodos) es puro
+        # overhead. Los bucles compilan sus acciones a closures y las
+        # repiten de verdad; Ingeniero recibe sus columnas directamente.
+        sub = tree.children[0]
+        if sub.data in _COMANDOS_BUCLE:
+            acciones = [_compilar_accion(a, _interprete) for a in sub.children]
+            result = getattr(_interprete, f"ejecutar_{sub.data}")(*acciones)
+        elif sub.data == "ingeniero":
+            result = _interprete.ingeniero([str(t) for t in sub.children])
+        else:
+            result = _interprete.transform(tree)
+        if verbose:
+            _emit("="*60, "")
         return result
     except Exception as e:
-        print(f"❌ Error: {e}")
-        print("="*60)
-        print()
+        if verbose:
+            _emit(f"❌ Error: {e}", "="*60, "")
         return None
 
 # --------------------------
 # MODO INTERACTIVO (OPCIONAL)
 # ---------------------------
-if __name__ == "__main__":
+def main():
+    """REPL interactivo: carga el CSV y ejecuta comandos de control de flujo.
+
+    Todo el trabajo con efectos (lectura del CSV, prints, bucle de input)
+    vive aquí y no a nivel de módulo: importar este archivo desde app.py u
+    otras herramientas es libre de efectos secundarios.
+    """
     # Cargar CSV solo si se ejecuta directamente
     try:
         df = pd.read_csv('datos_prueba.csv')
@@ -209,20 +347,20 @@ if __name__ == "__main__":
         print(f"❌ Error al cargar el CSV: {e}")
         exit()
     
-    print("\n🎮 Modo interactivo - Escribe tus comandos:")
-    print("Comandos disponibles:")
-    print("  • Football(accion col1 col2)          - Realizar la acción durante 10 seg.")
-    print("  • Ingeniero col1 col2 col3            - Guarda 3 columnas en variables")
-    print("  • Zombidito(Maceta c1 c2 Hipnoseta c3)- Ejecuta 2 acciones (ELSE)")
-    print("  • Zombistein(Petacereza columna)      - Bucle FOR 3 veces")
-    print("  • salir                               - Terminar")
-    print()
-    print("Acciones básicas disponibles:")
-    print("  • Maceta col1 col2    - Sumar dos columnas")
-    print("  • Hipnoseta columna   - Cuadrados aleatorios")
-    print("  • Petacereza columna  - Top 10 más grandes")
-    print("  • Jalapeño columna    - Eliminar columna")
-    print()
+    _emit("\n🎮 Modo interactivo - Escribe tus comandos:",
+          "Comandos disponibles:",
+          "  • Football(accion col1 col2)          - Realizar la acción durante 10 seg.",
+          "  • Ingeniero col1 col2 col3            - Guarda 3 columnas en variables",
+          "  • Zombidito(Maceta c1 c2 Hipnoseta c3)- Ejecuta 2 acciones (ELSE)",
+          "  • Zombistein(Petacereza columna)      - Bucle FOR 3 veces",
+          "  • salir                               - Terminar",
+          "",
+          "Acciones básicas disponibles:",
+          "  • Maceta col1 col2    - Sumar dos columnas",
+          "  • Hipnoseta columna   - Cuadrados aleatorios",
+          "  • Petacereza columna  - Top 10 más grandes",
+          "  • Jalapeño columna    - Eliminar columna",
+          "")
 
     while True:
         comando = input("🌿 > ").strip()
@@ -230,4 +368,7 @@ if __name__ == "__main__":
             print("👋 ¡Hasta luego!")
             break
         if comando:
-            ejecutar(comando, df)
+            ejecutar(comando, df, verbose=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# ---------------------------
+# GENERADOR DEL PARSER STANDALONE
+# ---------------------------
+# Paso de construcción opcional: vuelca la gramática de app.py a un archivo
+# .lark temporal y ejecuta lark.tools.standalone para producir puma_parser.py,
+# un módulo con las tablas LALR ya compiladas. Con él, app.py no paga el
+# análisis de la gramática ni la construcción de tablas en cada arranque.
+#
+# Ejecutar tras cualquier cambio en la gramática de app.py:
+#   python generar_parser.py
+import os
+import subprocess
+import sys
+import tempfile
+
+
+def main():
+    # Importar app solo para leer la gramática (evita ejecutar el REPL)
+    from app import grammar
+
+    with tempfile.NamedTemporaryFile("w", suffix=".lark", delete=False) as f:
+        f.write(grammar)
+        ruta_lark = f.name
+
+    destino = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puma_parser.py")
+    try:
+        with open(destino, "w") as salida:
+            subprocess.run(
+                [sys.executable, "-m", "lark.tools.standalone", ruta_lark],
+                stdout=salida, check=True,
+            )
+        print(f"✅ Parser standalone generado en '{destino}'")
+    finally:
+        os.unlink(ruta_lark)
+
+
+if __name__ == "__main__":
+    main()
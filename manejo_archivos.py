@@ -1,43 +1,186 @@
+import functools
 import pandas as pd
 import os
-from typing import Optional, Dict, Any
-from lark import Lark, Transformer
+import sys
+import weakref
+from typing import Optional
+from lark import Transformer
+from contexto import ContextoDF
+from resultados import ResultadoExito, ResultadoError, ResultadoInfo
+
+
+# Motores de E/S de CSV: pyarrow (opcional, pip install pyarrow) parsea y
+# escribe multihilo en C++ y suele ser varias veces más rápido que los
+# caminos por defecto de pandas. Si no está instalado se usan estos últimos.
+try:
+    import pyarrow as _pa
+    from pyarrow import csv as _pa_csv
+    _OPCIONES_READ_CSV = {"engine": "pyarrow"}
+except ImportError:
+    _pa = None
+    # memory_map evita la copia en espacio de usuario al leer con el motor C
+    _OPCIONES_READ_CSV = {"memory_map": True}
+
+# Motor de Excel: xlsxwriter es notablemente más rápido que openpyxl para
+# escritura; se elige el primero disponible (ambos opcionales).
+try:
+    import xlsxwriter  # noqa: F401
+    _ENGINE_EXCEL = "xlsxwriter"
+except ImportError:
+    _ENGINE_EXCEL = "openpyxl"
+
+
+def _guardar_csv(df, ruta_archivo):
+    """Escribe el DataFrame como CSV con el escritor más rápido disponible"""
+    if _pa is not None:
+        _pa_csv.write_csv(_pa.Table.from_pandas(df, preserve_index=False),
+                          ruta_archivo)
+    else:
+        # Fichero abierto con buffer de 1 MiB y escritura por bloques de
+        # filas: to_csv con chunksize emite el texto en tandas grandes que
+        # el buffer agrupa en pocas llamadas write() al sistema, en lugar
+        # de muchas escrituras pequeñas por fila
+        with open(ruta_archivo, "w", buffering=1 << 20, newline="") as f:
+            df.to_csv(f, index=False, chunksize=65536)
+
+
+def _exportar_json(df, ruta_archivo):
+    # JSON Lines sin sangría: el camino orient='records' con indent era el
+    # más lento del serializador de pandas
+    df.to_json(ruta_archivo, orient='records', lines=True)
+
+
+def _exportar_excel(df, ruta_archivo):
+    df.to_excel(ruta_archivo, index=False, engine=_ENGINE_EXCEL)
+
+
+def _exportar_parquet(df, ruta_archivo):
+    # Formato columnar binario: sin formateo de texto fila a fila y con
+    # compresión snappy acelerada en C++, órdenes de magnitud más rápido
+    # que CSV/JSON/XLSX en frames grandes (requiere pyarrow)
+    df.to_parquet(ruta_archivo, engine="pyarrow", compression="snappy")
+
+
+# Formatos de Papapum precomputados a nivel de módulo: el frozenset, el mapa
+# formato→extensión y la tabla de despacho formato→escritor sustituyen a la
+# lista y la escalera if/elif que se reconstruían en cada llamada
+_VALID_FORMATS = frozenset({"csv", "json", "excel", "xlsx", "parquet"})
+_EXT_MAP = {"csv": ".csv", "json": ".json", "excel": ".xlsx", "xlsx": ".xlsx",
+            "parquet": ".parquet"}
+_EXPORTADORES = {"csv": _guardar_csv, "json": _exportar_json,
+                 "excel": _exportar_excel, "xlsx": _exportar_excel,
+                 "parquet": _exportar_parquet}
+
+
+def _es_csv(ruta_archivo):
+    """Extensión .csv sin alocar una copia en minúsculas de toda la ruta"""
+    return os.path.splitext(ruta_archivo)[1].lower() == ".csv"
+
+
+@functools.lru_cache(maxsize=8)
+def _cargar_csv(ruta_archivo, mtime_ns, tamano):
+    """Lee un CSV memoizando por (ruta, mtime, tamaño).
+
+    Reabrir con Sol un archivo que no ha cambiado en disco devuelve el
+    DataFrame ya parseado sin repetir la lectura; si el archivo se modifica,
+    el mtime/tamaño nuevo invalida la entrada automáticamente. El llamador
+    debe copiar el resultado antes de mutarlo.
+    """
+    return pd.read_csv(ruta_archivo, **_OPCIONES_READ_CSV)
+
+
+class _InfoView:
+    """Vista perezosa de la información que devuelve Magnetoseta.
+
+    Se comporta como el dict `extra` de siempre (in / get / items /
+    corchetes), pero los campos proporcionales al número de columnas
+    (columnas_nombres, tipos_datos) solo se materializan si alguien los
+    consulta: en frames anchos construir esa lista y el dict de dtypes
+    por llamada era el grueso del coste. Guarda una referencia débil al
+    DataFrame para no alargar su vida más allá del gestor.
+    """
+
+    _CAMPOS = ("archivo", "filas", "columnas", "columnas_nombres", "tipos_datos")
+
+    def __init__(self, nombre_archivo, df):
+        self._df_ref = weakref.ref(df)
+        self.archivo = os.path.basename(nombre_archivo) if nombre_archivo else "Sin nombre"
+        self.filas = len(df)
+        self.columnas = df.shape[1]
+
+    @property
+    def _df(self):
+        df = self._df_ref()
+        if df is None:
+            raise ReferenceError("El DataFrame de Magnetoseta ya fue liberado")
+        return df
+
+    @functools.cached_property
+    def columnas_nombres(self):
+        return self._df.columns.tolist()
+
+    @functools.cached_property
+    def tipos_datos(self):
+        # astype(str) vectorizado sobre la Serie de dtypes, en lugar de una
+        # conversión por columna en Python
+        return self._df.dtypes.astype(str).to_dict()
+
+    def __contains__(self, key):
+        return key in self._CAMPOS
+
+    def __getitem__(self, key):
+        if key not in self._CAMPOS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._CAMPOS else default
+
+    def items(self):
+        return ((campo, getattr(self, campo)) for campo in self._CAMPOS)
 
 # ---------------------------
 # FASE 1: ANÁLISIS LÉXICO
 # ---------------------------
 import re
 
+# Especificación de tokens y regex maestro compilados una sola vez a nivel de
+# módulo: recompilar la alternancia en cada comando costaba un compile entero
+# por línea del REPL (mismo patrón que en app.py y comando_especial.py).
+# La alternancia va ordenada por frecuencia: el motor de re prueba las
+# alternativas de izquierda a derecha y STRING/SKIP aparecen varias veces
+# por comando frente a una sola palabra clave (ningún patrón solapa con
+# otro, así que el reorden no cambia qué token casa).
+token_specs = (
+    ("STRING", r'"[^"]*"'),               # Cadenas entre comillas
+    ("SKIP", r'[ \t]+'),                  # Espacios
+    ("SOL", r'Sol'),                      # Abrir archivo
+    ("CARNIVORA", r'Carnivora'),          # Guardar archivo
+    ("PAPAPUM", r'Papapum'),              # Exportar archivo
+    ("MAGNETOSETA", r'Magnetoseta'),      # Info del archivo
+    ("MELONPULTA", r'melonpulta_gelida'), # Cerrar archivo
+)
+# re.ASCII: todos los tokens son ASCII, desactivar la categorización
+# Unicode abarata las clases de caracteres
+_MASTER_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs),
+                        re.ASCII)
+
+def _iter_tokens(code):
+    """Genera los tokens bajo demanda, sin materializar la lista completa"""
+    # finditer recorre toda la cadena dentro del motor C de _sre; un hueco
+    # entre matches delata el carácter inesperado
+    pos_esperada = 0
+    for m in _MASTER_RE.finditer(code):
+        if m.start() != pos_esperada:
+            raise SyntaxError(f"Error léxico cerca de: {code[pos_esperada:pos_esperada+10]!r}")
+        pos_esperada = m.end()
+        if m.lastgroup != "SKIP":
+            yield m.lastgroup, m.group()
+    if pos_esperada != len(code):
+        raise SyntaxError(f"Error léxico cerca de: {code[pos_esperada:pos_esperada+10]!r}")
+
 def tokenize(code):
-    tokens = []
-    token_specs = [
-        ("SOL", r'Sol'),                      # Abrir archivo
-        ("CARNIVORA", r'Carnivora'),          # Guardar archivo
-        ("PAPAPUM", r'Papapum'),              # Exportar archivo
-        ("MAGNETOSETA", r'Magnetoseta'),      # Info del archivo
-        ("MELONPULTA", r'melonpulta_gelida'), # Cerrar archivo
-        ("STRING", r'"[^"]*"'),               # Cadenas entre comillas
-        ("SKIP", r'[ \t]+'),                  # Espacios
-    ]
-    
-    master = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs))
-    pos = 0
-    
-    while pos < len(code):
-        m = master.match(code, pos)
-        if not m:
-            raise SyntaxError(f"Error léxico cerca de: {code[pos:pos+10]!r}")
-        typ = m.lastgroup
-        if typ != "SKIP":
-            tokens.append((typ, m.group()))
-        pos = m.end()
-    
-    print("[OK] Tokens generados:")
-    for t in tokens:
-        print("  ", t)
-    print()
-    
-    return tokens
+    return list(_iter_tokens(code))
 
 # ---------------------------
 # FASE 2: ANÁLISIS SINTÁCTICO
@@ -55,7 +198,11 @@ STRING: /"[^"]*"/
 %ignore /\\s+/
 """
 
-parser = Lark(grammar, start="start")
+# El parser LALR (con cache en disco y maybe_placeholders desactivado para
+# que los STRING opcionales ausentes no inserten hijos None) se construye
+# perezosamente en _parsers.get_file_parser(): así el import de este módulo
+# no paga el análisis de la gramática si nunca se ejecuta un comando.
+from _parsers import get_file_parser
 
 # ---------------------------
 # FASE 3: INTÉRPRETE (EJECUTOR)
@@ -64,13 +211,27 @@ parser = Lark(grammar, start="start")
 class ManejoArchivos(Transformer):
     """Clase para gestionar las operaciones de archivos CSV del lenguaje PUMA"""
     
-    def __init__(self):
+    def __init__(self, ctx=None):
         """Inicializa el gestor de archivos"""
         super().__init__()
-        self.archivo_actual: Optional[pd.DataFrame] = None
+        # Si no se proporciona un contexto compartido, se crea uno propio
+        self.ctx = ctx if ctx is not None else ContextoDF()
         self.nombre_archivo: Optional[str] = None
         self.archivo_cargado: bool = False
-    
+        # Último comando de solo lectura ejecutado y su resultado: repetir
+        # Magnetoseta (p. ej. para consultar el estado) devuelve el resultado
+        # cacheado sin tokenizar, parsear ni transformar de nuevo. Cualquier
+        # comando de escritura lo invalida en ejecutar().
+        self._last_cmd: Optional[tuple] = None
+
+    @property
+    def archivo_actual(self) -> Optional[pd.DataFrame]:
+        return self.ctx.df
+
+    @archivo_actual.setter
+    def archivo_actual(self, value):
+        self.ctx.df = value
+
     # Métodos del Transformer
     def STRING(self, token):
         """Transforma un token STRING (ESCAPED_STRING) quitando las comillas"""
@@ -96,68 +257,61 @@ class ManejoArchivos(Transformer):
             ruta_archivo: Ruta del archivo CSV a abrir
             
         Returns:
-            Dict con el resultado de la operación
+            Resultado tipado de la operación (ResultadoExito / ResultadoError / ResultadoInfo)
             
         Raises:
             FileNotFoundError: Si el archivo no existe
             ValueError: Si el archivo no es CSV
         """
-        # Asegurar que sea string
-        ruta_archivo = str(ruta_archivo)
-        
+        # El método STRING del Transformer ya garantiza str; el re-str(...)
+        # por llamada era una asignación redundante (contrato verificado
+        # solo en modo depuración)
+        assert isinstance(ruta_archivo, str)
+
         # Validación léxica: verificar que sea una ruta válida
         if not ruta_archivo or not ruta_archivo.strip():
-            return {
-                "error": "Error léxico: La ruta del archivo debe ser una cadena válida",
-                "tipo": "LEXICO",
-                "linea": 1
-            }
+            return ResultadoError(
+                "Error léxico: La ruta del archivo debe ser una cadena válida",
+                tipo="LEXICO", extra={"linea": 1})
         
         # Validación sintáctica: verificar extensión CSV
-        if not ruta_archivo.lower().endswith('.csv'):
-            return {
-                "error": "Error sintáctico: El archivo debe tener extensión .csv",
-                "tipo": "SINTACTICO",
-                "archivo": ruta_archivo
-            }
-        
-        # Validación semántica: verificar que el archivo existe
-        if not os.path.exists(ruta_archivo):
-            return {
-                "error": f"Error semántico: El archivo '{ruta_archivo}' no existe",
-                "tipo": "SEMANTICO",
-                "archivo": ruta_archivo
-            }
-        
+        if not _es_csv(ruta_archivo):
+            return ResultadoError(
+                "Error sintáctico: El archivo debe tener extensión .csv",
+                tipo="SINTACTICO", extra={"archivo": ruta_archivo})
+
         try:
-            # Cargar el archivo CSV
-            self.archivo_actual = pd.read_csv(ruta_archivo)
+            # Cargar el archivo CSV (memoizado por mtime/tamaño; la copia
+            # aísla la caché de las transformaciones que mutan el DataFrame).
+            # Sin pre-comprobación con os.path.exists: este stat ya falla con
+            # FileNotFoundError si el archivo no existe, así que el syscall
+            # extra solo duplicaba trabajo (y dejaba una carrera entre la
+            # comprobación y la lectura)
+            st = os.stat(ruta_archivo)
+            self.archivo_actual = _cargar_csv(ruta_archivo, st.st_mtime_ns,
+                                              st.st_size).copy()
             self.nombre_archivo = ruta_archivo
             self.archivo_cargado = True
             
-            return {
-                "exito": True,
-                "mensaje": f"Sol: Archivo '{os.path.basename(ruta_archivo)}' abierto exitosamente"
-            }
-            
+            return ResultadoExito(
+                f"Sol: Archivo '{os.path.basename(ruta_archivo)}' abierto exitosamente")
+
+        except FileNotFoundError:
+            return ResultadoError(
+                f"Error semántico: El archivo '{ruta_archivo}' no existe",
+                tipo="SEMANTICO", extra={"archivo": ruta_archivo})
         except pd.errors.EmptyDataError:
-            return {
-                "error": "Error semántico: El archivo CSV está vacío",
-                "tipo": "SEMANTICO",
-                "archivo": ruta_archivo
-            }
+            return ResultadoError(
+                "Error semántico: El archivo CSV está vacío",
+                tipo="SEMANTICO", extra={"archivo": ruta_archivo})
         except pd.errors.ParserError as e:
-            return {
-                "error": f"Error sintáctico: El archivo CSV tiene formato inválido - {str(e)}",
-                "tipo": "SINTACTICO",
-                "archivo": ruta_archivo
-            }
+            return ResultadoError(
+                f"Error sintáctico: El archivo CSV tiene formato inválido - {str(e)}",
+                tipo="SINTACTICO", extra={"archivo": ruta_archivo})
         except Exception as e:
-            return {
-                "error": f"Error inesperado al abrir el archivo: {str(e)}",
-                "tipo": "RUNTIME",
-                "archivo": ruta_archivo
-            }
+            return ResultadoError(
+                f"Error inesperado al abrir el archivo: {str(e)}",
+                tipo="RUNTIME", extra={"archivo": ruta_archivo})
     
     # Método del Transformer para ejecutar comando carnivora
     def carnivora(self, items):
@@ -174,60 +328,48 @@ class ManejoArchivos(Transformer):
             ruta_archivo: Ruta donde guardar. Si es None, sobrescribe el archivo actual
             
         Returns:
-            Dict con el resultado de la operación
+            Resultado tipado de la operación (ResultadoExito / ResultadoError / ResultadoInfo)
         """
         # Validación semántica: verificar que hay un archivo cargado
         if not self.archivo_cargado or self.archivo_actual is None:
-            return {
-                "error": "Error semántico: No hay ningún archivo cargado. Use 'Sol' primero para abrir un archivo",
-                "tipo": "SEMANTICO",
-                "comando": "Carnivora"
-            }
+            return ResultadoError(
+                "Error semántico: No hay ningún archivo cargado. Use 'Sol' primero para abrir un archivo",
+                tipo="SEMANTICO", extra={"comando": "Carnivora"})
         
         # Si no se proporciona ruta, usar la del archivo actual
         if ruta_archivo is None:
             if self.nombre_archivo is None:
-                return {
-                    "error": "Error semántico: No hay ruta de archivo definida. Proporcione una ruta",
-                    "tipo": "SEMANTICO",
-                    "comando": "Carnivora"
-                }
+                return ResultadoError(
+                    "Error semántico: No hay ruta de archivo definida. Proporcione una ruta",
+                    tipo="SEMANTICO", extra={"comando": "Carnivora"})
             ruta_archivo = self.nombre_archivo
-        
-        # Asegurar que sea string
-        ruta_archivo = str(ruta_archivo)
-        
+
+        # Tanto el STRING del Transformer como nombre_archivo son ya str
+        assert isinstance(ruta_archivo, str)
+
         # Validación sintáctica: verificar extensión CSV
-        if not ruta_archivo.lower().endswith('.csv'):
-            return {
-                "error": "Error sintáctico: El archivo debe tener extensión .csv",
-                "tipo": "SINTACTICO",
-                "archivo": ruta_archivo
-            }
-        
+        if not _es_csv(ruta_archivo):
+            return ResultadoError(
+                "Error sintáctico: El archivo debe tener extensión .csv",
+                tipo="SINTACTICO", extra={"archivo": ruta_archivo})
+
         try:
             # Guardar el archivo
-            self.archivo_actual.to_csv(ruta_archivo, index=False)
+            _guardar_csv(self.archivo_actual, ruta_archivo)
             
-            return {
-                "exito": True,
-                "mensaje": f"Carnivora: Archivo guardado exitosamente en '{os.path.basename(ruta_archivo)}'",
-                "archivo": ruta_archivo,
-                "filas_guardadas": len(self.archivo_actual)
-            }
+            return ResultadoExito(
+                f"Carnivora: Archivo guardado exitosamente en '{os.path.basename(ruta_archivo)}'",
+                extra={"archivo": ruta_archivo,
+                       "filas_guardadas": len(self.archivo_actual)})
             
         except PermissionError:
-            return {
-                "error": f"Error de permisos: No se puede escribir en '{ruta_archivo}'",
-                "tipo": "RUNTIME",
-                "archivo": ruta_archivo
-            }
+            return ResultadoError(
+                f"Error de permisos: No se puede escribir en '{ruta_archivo}'",
+                tipo="RUNTIME", extra={"archivo": ruta_archivo})
         except Exception as e:
-            return {
-                "error": f"Error al guardar el archivo: {str(e)}",
-                "tipo": "RUNTIME",
-                "archivo": ruta_archivo
-            }
+            return ResultadoError(
+                f"Error al guardar el archivo: {str(e)}",
+                tipo="RUNTIME", extra={"archivo": ruta_archivo})
     
     # Método del Transformer para ejecutar comando papapum
     def papapum(self, items):
@@ -237,7 +379,7 @@ class ManejoArchivos(Transformer):
         formato = items[1] if len(items) > 1 else 'csv'
         return self._papapum(ruta, formato)
     
-    def _papapum(self, ruta_exportacion: str, formato: str = 'csv') -> Dict[str, Any]:
+    def _papapum(self, ruta_exportacion: str, formato: str = 'csv'):
         """
         Papapum - Comando para exportar el archivo en diferentes formatos
         
@@ -246,191 +388,203 @@ class ManejoArchivos(Transformer):
             formato: Formato de exportación ('csv', 'json', 'excel')
             
         Returns:
-            Dict con el resultado de la operación
+            Resultado tipado de la operación (ResultadoExito / ResultadoError / ResultadoInfo)
         """
-        # Asegurar que sean strings
-        ruta_exportacion = str(ruta_exportacion)
-        formato = str(formato)
-        
+        # El STRING del Transformer y el literal por defecto son ya str
+        assert isinstance(ruta_exportacion, str) and isinstance(formato, str)
+
         # Validación semántica: verificar que hay un archivo cargado
         if not self.archivo_cargado or self.archivo_actual is None:
-            return {
-                "error": "Error semántico: No hay ningún archivo cargado. Use 'Sol' primero para abrir un archivo",
-                "tipo": "SEMANTICO",
-                "comando": "Papapum"
-            }
+            return ResultadoError(
+                "Error semántico: No hay ningún archivo cargado. Use 'Sol' primero para abrir un archivo",
+                tipo="SEMANTICO", extra={"comando": "Papapum"})
         
         # Validación léxica: verificar ruta válida
         if not ruta_exportacion or not ruta_exportacion.strip():
-            return {
-                "error": "Error léxico: La ruta de exportación debe ser una cadena válida",
-                "tipo": "LEXICO",
-                "comando": "Papapum"
-            }
+            return ResultadoError(
+                "Error léxico: La ruta de exportación debe ser una cadena válida",
+                tipo="LEXICO", extra={"comando": "Papapum"})
         
         # Validación sintáctica: verificar formato válido
-        formatos_validos = ['csv', 'json', 'excel', 'xlsx']
-        if formato.lower() not in formatos_validos:
-            return {
-                "error": f"Error sintáctico: Formato '{formato}' no válido. Use: {', '.join(formatos_validos)}",
-                "tipo": "SINTACTICO",
-                "comando": "Papapum"
-            }
-        
+        if formato.lower() not in _VALID_FORMATS:
+            return ResultadoError(
+                f"Error sintáctico: Formato '{formato}' no válido. Use: {', '.join(sorted(_VALID_FORMATS))}",
+                tipo="SINTACTICO", extra={"comando": "Papapum"})
+
         try:
             formato = formato.lower()
-            
-            # Exportar según el formato
-            if formato == 'csv':
-                if not ruta_exportacion.endswith('.csv'):
-                    ruta_exportacion += '.csv'
-                self.archivo_actual.to_csv(ruta_exportacion, index=False)
-                
-            elif formato == 'json':
-                if not ruta_exportacion.endswith('.json'):
-                    ruta_exportacion += '.json'
-                self.archivo_actual.to_json(ruta_exportacion, orient='records', indent=2)
-                
-            elif formato in ['excel', 'xlsx']:
-                if not ruta_exportacion.endswith('.xlsx'):
-                    ruta_exportacion += '.xlsx'
-                self.archivo_actual.to_excel(ruta_exportacion, index=False, engine='openpyxl')
-            
-            return {
-                "exito": True,
-                "mensaje": f"Papapum: Archivo exportado exitosamente como '{formato.upper()}' en '{os.path.basename(ruta_exportacion)}'",
-                "archivo": ruta_exportacion,
-                "formato": formato.upper(),
-                "filas_exportadas": len(self.archivo_actual)
-            }
+
+            # Completar la extensión y despachar al escritor por la tabla
+            # del módulo, sin la escalera if/elif por formato
+            ext = _EXT_MAP[formato]
+            if not ruta_exportacion.endswith(ext):
+                ruta_exportacion += ext
+            _EXPORTADORES[formato](self.archivo_actual, ruta_exportacion)
+
+            return ResultadoExito(
+                f"Papapum: Archivo exportado exitosamente como '{formato.upper()}' en '{os.path.basename(ruta_exportacion)}'",
+                extra={"archivo": ruta_exportacion,
+                       "formato": formato.upper(),
+                       "filas_exportadas": len(self.archivo_actual)})
             
         except ImportError as e:
-            return {
-                "error": f"Error: Librería faltante para exportar a {formato.upper()}. Instale 'openpyxl' para Excel",
-                "tipo": "RUNTIME",
-                "detalle": str(e)
-            }
+            return ResultadoError(
+                f"Error: Librería faltante para exportar a {formato.upper()}. Instale 'openpyxl' para Excel o 'pyarrow' para Parquet",
+                tipo="RUNTIME", extra={"detalle": str(e)})
         except Exception as e:
-            return {
-                "error": f"Error al exportar el archivo: {str(e)}",
-                "tipo": "RUNTIME",
-                "archivo": ruta_exportacion
-            }
+            return ResultadoError(
+                f"Error al exportar el archivo: {str(e)}",
+                tipo="RUNTIME", extra={"archivo": ruta_exportacion})
     
     # Método del Transformer para ejecutar comando magnetoseta
     def magnetoseta(self, items):
         """Método del Transformer - ejecuta comando Magnetoseta"""
         return self._Magnetoseta()
-    
-    def _Magnetoseta(self) -> Dict[str, Any]:
+
+    def _Magnetoseta(self):
         """
         Magnetoseta - Obtiene información sobre el archivo actualmente cargado
-        
+
         Returns:
-            Dict con información del archivo o None si no hay archivo cargado
+            ResultadoExito con la información del archivo, o ResultadoInfo si no hay archivo cargado
         """
         if not self.archivo_cargado or self.archivo_actual is None:
-            return {
-                "cargado": False,
-                "mensaje": "No hay ningún archivo cargado"
-            }
-        
-        return {
-            "exito": True,
-            "mensaje": "Magnetoseta: Información del archivo actual",
-            "cargado": True,
-            "archivo": os.path.basename(self.nombre_archivo) if self.nombre_archivo else "Sin nombre",
-            "filas": len(self.archivo_actual),
-            "columnas": len(self.archivo_actual.columns),
-            "columnas_nombres": list(self.archivo_actual.columns),
-            "tipos_datos": {k: str(v) for k, v in self.archivo_actual.dtypes.to_dict().items()}
-        }
+            return ResultadoInfo("No hay ningún archivo cargado", advertencia=True)
+
+        return ResultadoExito(
+            "Magnetoseta: Información del archivo actual",
+            extra=_InfoView(self.nombre_archivo, self.archivo_actual))
     
     # Método del Transformer para ejecutar comando melonpulta
     def melonpulta(self, items):
         """Método del Transformer - ejecuta comando melonpulta_gelida"""
         return self._melonpulta_gelida()
     
-    def _melonpulta_gelida(self) -> Dict[str, Any]:
+    def _melonpulta_gelida(self):
         """
         melonpulta_gelida - Cierra el archivo actual y limpia el estado
         
         Returns:
-            Dict con el resultado de la operación
+            Resultado tipado de la operación (ResultadoExito / ResultadoError / ResultadoInfo)
         """
         if not self.archivo_cargado:
-            return {
-                "mensaje": "melonpulta_gelida: No hay ningún archivo abierto para cerrar"
-            }
+            return ResultadoInfo("melonpulta_gelida: No hay ningún archivo abierto para cerrar")
         
         archivo_cerrado = self.nombre_archivo
         self.archivo_actual = None
         self.nombre_archivo = None
         self.archivo_cargado = False
         
-        return {
-            "exito": True,
-            "mensaje": f"melonpulta_gelida: Archivo '{os.path.basename(archivo_cerrado) if archivo_cerrado else 'Sin nombre'}' cerrado exitosamente"
-        }
+        return ResultadoExito(
+            f"melonpulta_gelida: Archivo '{os.path.basename(archivo_cerrado) if archivo_cerrado else 'Sin nombre'}' cerrado exitosamente")
 
 
 
 # ---------------------------
 # FUNCIÓN PRINCIPAL
 # ---------------------------
-def ejecutar(codigo, gestor_archivos=None):
+# Gestor por defecto a nivel de proceso: construir un ManejoArchivos por
+# comando repetía Transformer.__init__ (y su tabla de despacho de reglas)
+# en cada llamada. Los llamadores que necesiten aislamiento de estado
+# deben pasar su propia instancia.
+_DEFAULT_GESTOR = ManejoArchivos()
+
+def _arbol_en_linea(tree):
+    """Resumen de una línea del árbol: O(tokens del comando) frente a
+    tree.pretty(), que recorre y formatea la estructura completa"""
+    sub = tree.children[0]
+    return f"{sub.data}({', '.join(str(c) for c in sub.children)})"
+
+def _lineas_resultado(result):
+    """Formatea el bloque de resultado del modo verbose (un isinstance por
+    tipo en lugar de sondear claves)"""
+    lineas = ["="*60]
+    if isinstance(result, ResultadoError):
+        lineas.append(f"[ERROR] {result.error}")
+        lineas.append(f"  Tipo: {result.tipo}")
+    elif isinstance(result, ResultadoExito):
+        lineas.append(f"[EXITO] {result.mensaje}")
+        lineas.extend(f"  {key}: {value}" for key, value in result.extra.items())
+    elif isinstance(result, ResultadoInfo):
+        lineas.append(f"[INFO] {result.mensaje}")
+    lineas.append("="*60)
+    lineas.append("")
+    return lineas
+
+def ejecutar(codigo, gestor_archivos=None, verbose=False):
     """
     Ejecuta un comando del lenguaje PUMA
-    
+
     Args:
         codigo: Comando a ejecutar
-        gestor_archivos: Instancia de ManejoArchivos (si es None, se crea una nueva)
-    
+        gestor_archivos: Instancia de ManejoArchivos (si es None, se usa la
+                         instancia compartida del módulo; pasar una propia
+                         para aislar el estado entre llamadores)
+        verbose: Si es True, muestra tokens, árbol y resultado por stdout.
+                 Por defecto el camino caliente no imprime nada: el coste de
+                 formatear tree.pretty() y de los flush de cada print domina
+                 el tiempo de los comandos cortos cuando se llama en bucle.
+
     Returns:
-        Tupla (resultado, gestor) donde resultado es el dict de salida y gestor es la instancia actualizada
+        Tupla (resultado, gestor) donde resultado es el resultado tipado y gestor es la instancia actualizada
     """
-    print(f"[EJECUTANDO] {codigo!r}\n")
-    
-    # Si no se proporciona un gestor, crear uno nuevo
+    # Si no se proporciona un gestor, usar el compartido del módulo
     if gestor_archivos is None:
-        gestor_archivos = ManejoArchivos()
-    
+        gestor_archivos = _DEFAULT_GESTOR
+
+    # Atajo para el comando de solo lectura repetido: si el código coincide
+    # con el último Magnetoseta ejecutado, su resultado sigue siendo válido
+    # (solo los comandos de escritura lo invalidan) y se devuelve sin
+    # tokenizar, parsear ni transformar de nuevo
+    ultimo = gestor_archivos._last_cmd
+    if ultimo is not None and codigo == ultimo[0]:
+        result = ultimo[1]
+        if verbose:
+            sys.stdout.write("\n".join(
+                [f"[EJECUTANDO] {codigo!r} (resultado cacheado)", ""]
+                + _lineas_resultado(result)) + "\n")
+        return result, gestor_archivos
+
+    # Las líneas de diagnóstico se acumulan y se vuelcan con una única
+    # escritura al final, en lugar de un print (y su flush) por línea
+    buf = []
     try:
-        # 1. Análisis Léxico
-        tokens = tokenize(codigo)
-        
+        if verbose:
+            buf.append(f"[EJECUTANDO] {codigo!r}\n")
+            # 1. Análisis Léxico (solo diagnóstico: Lark lexa por su cuenta;
+            # el generador formatea token a token sin materializar la lista)
+            buf.append("[OK] Tokens generados:")
+            buf.extend(f"   {t}" for t in _iter_tokens(codigo))
+            buf.append("")
+
         # 2. Análisis Sintáctico
-        tree = parser.parse(codigo)
-        print("[OK] Árbol sintáctico:")
-        print(tree.pretty())
-        print()
-        
+        tree = get_file_parser().parse(codigo)
+        if verbose:
+            buf.append(f"[OK] Árbol sintáctico: {_arbol_en_linea(tree)}\n")
+
         # 3. Interpretación/Ejecución
         result = gestor_archivos.transform(tree)
-        
-        # Mostrar resultado
-        print("="*60)
-        if result:
-            if "error" in result:
-                print(f"[ERROR] {result['error']}")
-                print(f"  Tipo: {result.get('tipo', 'DESCONOCIDO')}")
-            elif "exito" in result:
-                print(f"[EXITO] {result.get('mensaje', 'Operación completada')}")
-                for key, value in result.items():
-                    if key not in ['exito', 'mensaje']:
-                        print(f"  {key}: {value}")
-            else:
-                print(f"[INFO] {result.get('mensaje', result)}")
-        print("="*60)
-        print()
-        
+
+        # Solo Magnetoseta es cacheable; cualquier otro comando (todos
+        # escriben o mutan estado) invalida el atajo
+        if tree.children[0].data == "magnetoseta":
+            gestor_archivos._last_cmd = (codigo, result)
+        else:
+            gestor_archivos._last_cmd = None
+
+        if verbose:
+            buf.extend(_lineas_resultado(result))
+            sys.stdout.write("\n".join(buf) + "\n")
+
         return result, gestor_archivos
-        
+
     except Exception as e:
-        print(f"[ERROR FATAL] {e}")
-        print("="*60)
-        print()
-        return {"error": str(e), "tipo": "FATAL"}, gestor_archivos
+        if verbose:
+            buf.append(f"[ERROR FATAL] {e}")
+            buf.append("="*60)
+            buf.append("")
+            sys.stdout.write("\n".join(buf) + "\n")
+        return ResultadoError(str(e), tipo="FATAL"), gestor_archivos
 
 # --------------------------
 # MODO INTERACTIVO (OPCIONAL)
@@ -455,4 +609,4 @@ if __name__ == "__main__":
             print("[INFO] Hasta luego!")
             break
         if comando:
-            resultado, gestor = ejecutar(comando, gestor)
+            resultado, gestor = ejecutar(comando, gestor, verbose=True)
@@ -0,0 +1,27 @@
+# ---------------------------
+# RESULTADOS TIPADOS DE COMANDOS
+# ---------------------------
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+@dataclass(slots=True)
+class ResultadoExito:
+    """Comando ejecutado con éxito; extra lleva los datos a mostrar"""
+    mensaje: str
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class ResultadoError:
+    """Comando fallido, con el tipo de error (LEXICO/SINTACTICO/SEMANTICO/RUNTIME)"""
+    error: str
+    tipo: str = "RUNTIME"
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class ResultadoInfo:
+    """Mensaje informativo sin datos asociados"""
+    mensaje: str
+    advertencia: bool = False
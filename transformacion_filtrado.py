@@ -1,37 +1,149 @@
+import functools
+import os
 import re
+import sys
 import pandas as pd
 import numpy as np
-from lark import Lark, Transformer
-from lark.exceptions import LarkError, UnexpectedInput, UnexpectedToken
+from lark import Transformer
+from lark.exceptions import LarkError, UnexpectedCharacters, UnexpectedInput, UnexpectedToken
+from contexto import ContextoDF
+
+# Volcado de tokens solo en depuración (PUMA_DEBUG=1): el lexer de Lark ya
+# hace la única pasada léxica real dentro de parse(), así que tokenizar
+# aparte en cada comando duplicaba el trabajo de regex (misma bandera que
+# en app.py)
+DEBUG = os.environ.get("PUMA_DEBUG") == "1"
+
+# Parquet opcional (pip install pyarrow): el estado de la sesión se persiste
+# también en formato columnar binario, que evita pasar cada número por el
+# formateador de texto de to_csv y comprime con diccionario+RLE. El CSV se
+# mantiene como archivo de cara al usuario; el .parquet es solo una copia
+# de trabajo que se prefiere al cargar si es más reciente.
+try:
+    import pyarrow as _pa  # noqa: F401
+    _PARQUET = True
+except ImportError:
+    _PARQUET = False
+
+# Núcleos numéricos con Numba (opcional, pip install numba): @njit compila
+# los bucles a código máquina y cache=True serializa el binario, así el coste
+# de compilación se paga una sola vez por máquina. Los bucles de Zombistein y
+# Football repiten estas acciones muchas veces, lo que amortiza el warmup;
+# por el mismo motivo no se condiciona el despacho a un umbral de tamaño:
+# tras la primera llamada el núcleo compilado no es más lento que NumPy ni
+# en frames pequeños, y el umbral añadiría una rama por operación.
+# Sin numba, el fallback de NumPy ya ejecuta la operación vectorizada en C.
+try:
+    from numba import njit, prange
+
+    # parallel=True reparte el bucle de prange entre los núcleos de la
+    # máquina; escribir sobre un buffer de salida preasignado (out) evita
+    # que cada llamada asigne un ndarray temporal nuevo. La compilación
+    # perezosa de @njit ya especializa por dtype: la primera llamada con
+    # cada combinación de tipos (int64+int64, float64+float64, mixta) emite
+    # y cachea su propio código máquina, así LLVM elige el ancho SIMD por
+    # tamaño de elemento y el bucle interno no despacha por dtype.
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _add_cols(a, b, out):
+        for i in prange(a.shape[0]):
+            out[i] = a[i] + b[i]
+
+    # a * a en lugar de a ** 2: la multiplicación evita el despacho del
+    # operador potencia y es equivalente para el cuadrado
+    @njit(cache=True, fastmath=True)
+    def _cuadrado_kernel(a):
+        return a * a
+
+    # Núcleos fusionados para las ramas de acumulación: una sola pasada
+    # sobre memoria en lugar de encadenar dos operaciones con su array
+    # intermedio (la fusión ahorra el tráfico DRAM del resultado parcial)
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _add3(a, b, c, out):
+        for i in prange(a.shape[0]):
+            out[i] = a[i] + b[i] + c[i]
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _cuadrado_acumular(a, existente, out):
+        for i in prange(a.shape[0]):
+            out[i] = existente[i] + a[i] * a[i]
+except ImportError:
+    # Segundo nivel opcional: numexpr (pip install numexpr) trocea los
+    # arrays en bloques residentes en cache y evalúa la expresión completa
+    # en una sola pasada SIMD, fusionando sin los temporales que deja
+    # encadenar ufuncs de NumPy.
+    try:
+        import numexpr as _ne
+
+        def _add_cols(a, b, out):
+            _ne.evaluate("a + b", local_dict={"a": a, "b": b}, out=out)
+
+        def _cuadrado_kernel(a):
+            return _ne.evaluate("a * a", local_dict={"a": a})
+
+        def _add3(a, b, c, out):
+            _ne.evaluate("a + b + c",
+                         local_dict={"a": a, "b": b, "c": c}, out=out)
+
+        def _cuadrado_acumular(a, existente, out):
+            _ne.evaluate("existente + a * a",
+                         local_dict={"a": a, "existente": existente}, out=out)
+    except ImportError:
+        def _add_cols(a, b, out):
+            np.add(a, b, out=out)
+
+        def _cuadrado_kernel(a):
+            return a * a
+
+        # Sin numba ni numexpr no se puede fusionar de verdad: dos pasadas
+        # vectorizadas reutilizando el buffer de salida como intermedio
+        def _add3(a, b, c, out):
+            np.add(a, b, out=out)
+            np.add(out, c, out=out)
+
+        def _cuadrado_acumular(a, existente, out):
+            np.multiply(a, a, out=out)
+            np.add(out, existente, out=out)
 
 # ---------------------------
 # FASE 1: ANÁLISIS LÉXICO
 # ---------------------------
-def tokenize(code):
-    tokens = []
-    token_specs = [
-        ("MACETA", r'Maceta'),           # Sumar columnas
-        ("HIPNOSETA", r'Hipnoseta'),     # Cuadrados aleatorios
-        ("PETACEREZA", r'Petacereza'),   # Top 10
-        ("JALAPENO", r'Jalapeño'),       # Eliminar columna
-        ("COLUMN", r'[a-zA-Z_]\w*'),     # Nombres de columnas
-        ("SKIP", r'[ \t]+'),             # Espacios
-    ]
-    master = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs))
-    pos = 0
-    while pos < len(code):
-        m = master.match(code, pos)
-        if not m:
-            error_context = code[pos:min(pos+20, len(code))]
-            raise SyntaxError(f"Carácter inesperado en posición {pos}: '{error_context}'")
+# Especificación de tokens y regex maestro compilados una sola vez a nivel de
+# módulo: recompilar la alternancia en cada comando costaba un compile entero
+# por línea del REPL (mismo patrón que en app.py y comando_especial.py).
+token_specs = (
+    ("MACETA", r'Maceta'),           # Sumar columnas
+    ("HIPNOSETA", r'Hipnoseta'),     # Cuadrados aleatorios
+    ("PETACEREZA", r'Petacereza'),   # Top 10
+    ("JALAPENO", r'Jalapeño'),       # Eliminar columna
+    ("COLUMN", r'[a-zA-Z_]\w*'),     # Nombres de columnas
+    ("SKIP", r'[ \t]+'),             # Espacios
+)
+_MASTER_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in token_specs))
+# Método ligado una sola vez: evita el lookup de atributo por llamada
+_finditer = _MASTER_RE.finditer
+
+def _iter_tokens(code):
+    """Genera los tokens bajo demanda, sin materializar la lista completa"""
+    # finditer recorre toda la cadena dentro del motor C de _sre; un hueco
+    # entre matches delata el carácter inesperado
+    pos_esperada = 0
+    for m in _finditer(code):
+        if m.start() != pos_esperada:
+            error_context = code[pos_esperada:min(pos_esperada+20, len(code))]
+            raise SyntaxError(f"Carácter inesperado en posición {pos_esperada}: '{error_context}'")
+        pos_esperada = m.end()
         typ = m.lastgroup
         if typ != "SKIP":
-            tokens.append((typ, m.group()))
-        pos = m.end()
-    print("✅ Tokens generados:")
-    for t in tokens:
-        print("  ", t)
-    print()
+            yield typ, m.group()
+    if pos_esperada != len(code):
+        error_context = code[pos_esperada:min(pos_esperada+20, len(code))]
+        raise SyntaxError(f"Carácter inesperado en posición {pos_esperada}: '{error_context}'")
+
+def tokenize(code):
+    tokens = list(_iter_tokens(code))
+    # Una sola escritura para toda la lista: un print por token era una
+    # llamada write() (y su flush) por cada uno
+    print("✅ Tokens generados:\n" + "\n".join(f"   {t}" for t in tokens) + "\n")
     return tokens
 
 # ---------------------------
@@ -43,117 +155,317 @@ maceta: "Maceta" COLUMN COLUMN
 hipnoseta: "Hipnoseta" COLUMN
 petacereza: "Petacereza" COLUMN
 jalapeno: "Jalapeño" COLUMN
+
+// Palabras clave declaradas como terminales con nombre: cada una es un solo
+// regex para el lexer (más rápido que resolver literales por regla) y Lark
+// enlaza las apariciones literales de las reglas con estos terminales, por
+// lo que siguen filtrándose del árbol como literales inline (igual que en
+// las gramáticas de app.py y control_flujo_variables.py).
+MACETA: "Maceta"
+HIPNOSETA: "Hipnoseta"
+PETACEREZA: "Petacereza"
+JALAPENO: "Jalapeño"
+
 COLUMN: /[a-zA-Z_]\\w*/
 %ignore /\\s+/
 """
-parser = Lark(grammar, start="start")
+# El parser LALR (con cache en disco) se construye perezosamente en
+# _parsers.get_df_parser(): así el import de este módulo no paga el
+# análisis de la gramática si nunca se ejecuta un comando.
+from _parsers import get_df_parser
+
+@functools.lru_cache(maxsize=128)
+def _cached_parse(src):
+    """Parsea memoizando por comando: en el REPL se repiten los mismos
+    comandos cortos y el árbol de Lark es inmutable, así que es seguro
+    reutilizarlo entre transformaciones (mismo patrón que en app.py).
+    Con un acierto, el coste del comando repetido baja de una pasada LALR
+    completa a un lookup en el dict del lru_cache."""
+    return get_df_parser().parse(src)
 
 # ---------------------------
 # FASE 3: INTÉRPRETE (EJECUTOR)
 # ---------------------------
 class DataFrameInterpreter(Transformer):
-    def __init__(self, dataframe):
+    def __init__(self, dataframe, ctx=None, verbose=False):
         super().__init__()
-        self.df = dataframe
+        # Si no se proporciona un contexto compartido, se crea uno propio
+        self.ctx = ctx if ctx is not None else ContextoDF(dataframe)
         self.modified = False
-    
+        # Con verbose=False las operaciones no imprimen nada: formatear el
+        # repr del DataFrame (head incluido) cuesta O(columnas) por comando
+        # y domina sobre la propia aritmética en frames anchos — y los
+        # bucles de Football/Zombistein repetirían esa E/S en caliente. Los
+        # REPL ya muestran el DataFrame actualizado tras cada modificación
+        # (bandera `modified`), así que la salida por operación es redundante.
+        self.verbose = verbose
+        self._sync_columnas()
+
+    @property
+    def df(self):
+        return self.ctx.df
+
+    @df.setter
+    def df(self, value):
+        self.ctx.df = value
+
+    # Cache de columnas: consultar `col in df.columns` recorre el Index de
+    # pandas y pd.api.types.is_numeric_dtype hace introspección de tipos en
+    # Python, ambos por cada comando. El frozenset y el dict los reducen a
+    # un lookup O(1). La versión del ContextoDF detecta reasignaciones del
+    # DataFrame hechas fuera de este intérprete; las mutaciones propias
+    # (crear/eliminar columna in-place) actualizan el cache a mano, así la
+    # introspección de dtypes solo ocurre al (re)sincronizar — las columnas
+    # que crean Maceta/Hipnoseta se anotan numéricas por construcción, sin
+    # volver a preguntarle el dtype a pandas.
+    def _sync_columnas(self):
+        df = self.ctx.df
+        if df is None:
+            self._cols_set = frozenset()
+            self._numeric = {}
+        else:
+            self._cols_set = frozenset(df.columns)
+            self._numeric = {c: pd.api.types.is_numeric_dtype(df[c])
+                             for c in df.columns}
+        self._cache_version = self.ctx.version
+
+    def _columnas(self):
+        if self._cache_version != self.ctx.version:
+            self._sync_columnas()
+        return self._cols_set
+
     def maceta(self, args):
-        col1 = str(args[0])
-        col2 = str(args[1])
-        print(f"🌱 Maceta: Sumando columnas '{col1}' + '{col2}'")
-        
-        if col1 not in self.df.columns:
+        # args ya son str internados (convertidos en COLUMN): sin coerción
+        col1, col2 = args[0], args[1]
+        if self.verbose:
+            print(f"🌱 Maceta: Sumando columnas '{col1}' + '{col2}'")
+
+        # Con el contexto descargado (melonpulta_gelida) no hay DataFrame:
+        # error semántico limpio en vez de un AttributeError sobre None
+        if self.df is None:
+            raise ValueError("No hay ningún archivo cargado. Usa: Sol \"archivo.csv\"")
+
+
+        columnas = self._columnas()
+        if col1 not in columnas:
             raise ValueError(f"La columna '{col1}' no existe. Columnas disponibles: {list(self.df.columns)}")
-        if col2 not in self.df.columns:
+        if col2 not in columnas:
             raise ValueError(f"La columna '{col2}' no existe. Columnas disponibles: {list(self.df.columns)}")
-        
-        # Verificar que las columnas sean numéricas
-        if not pd.api.types.is_numeric_dtype(self.df[col1]):
+
+        # Verificar que las columnas sean numéricas (lookup en el cache)
+        if not self._numeric[col1]:
             raise ValueError(f"La columna '{col1}' no es numérica")
-        if not pd.api.types.is_numeric_dtype(self.df[col2]):
+        if not self._numeric[col2]:
             raise ValueError(f"La columna '{col2}' no es numérica")
         
-        # Crear nueva columna con la suma
+        # Crear nueva columna con la suma (núcleo sobre los ndarrays crudos:
+        # sin la alineación de índices ni la Serie intermedia del operador +
+        # de pandas, escribiendo en un buffer preasignado con el dtype
+        # resultante)
         new_col_name = f"{col1}_mas_{col2}"
-        if new_col_name in self.df.columns:
-            self.df[new_col_name] = self.df[new_col_name] + self.df[col1] + self.df[col2]
+        a = self.df[col1].to_numpy()
+        b = self.df[col2].to_numpy()
+        existente = (self.df[new_col_name].to_numpy()
+                     if new_col_name in columnas else None)
+        if existente is None:
+            out = np.empty(a.shape[0], dtype=np.result_type(a, b))
+            # Operandos al dtype del resultado ANTES del núcleo: la ufunc
+            # elige su bucle por los dtypes de entrada, así que confiar en
+            # que out= ensanche dejaría la suma envolver en el dtype
+            # estrecho y castear ya tarde (astype con copy=False es gratis
+            # cuando los dtypes coinciden)
+            a = a.astype(out.dtype, copy=False)
+            b = b.astype(out.dtype, copy=False)
+            _add_cols(a, b, out)
         else:
-            self.df[new_col_name] = self.df[col1] + self.df[col2]
+            # Suma y acumulación fusionadas en una sola pasada sobre memoria,
+            # sin las dos Series intermedias que creaba encadenar `+` de
+            # pandas. Se escribe en un buffer nuevo y no sobre el ndarray de
+            # la columna existente: mutar ese buffer en vivo ensuciaría la
+            # columna a medias si el núcleo fallara, y el dtype del resultado
+            # puede ser más ancho que el almacenado
+            out = np.empty(a.shape[0], dtype=np.result_type(a, b, existente))
+            a = a.astype(out.dtype, copy=False)
+            b = b.astype(out.dtype, copy=False)
+            existente = existente.astype(out.dtype, copy=False)
+            _add3(a, b, existente, out)
+        self.df[new_col_name] = out
+        # La columna nueva es numérica por construcción: se anota en el
+        # cache sin volver a introspeccionar dtypes
+        self._cols_set = columnas | {new_col_name}
+        self._numeric[new_col_name] = True
         self.modified = True
-        
-        print(f"✅ Nueva columna '{new_col_name}' creada:")
-        print(self.df[[col1, col2, new_col_name]].head())
+
+        if self.verbose:
+            print(f"✅ Nueva columna '{new_col_name}' creada:")
+            print(self.df[[col1, col2, new_col_name]].head())
         return self.df
     
     def hipnoseta(self, args):
-        col = str(args[0])
-        print(f"🍄 Hipnoseta: Creando columna de cuadrados de '{col}'")
-        
-        if col not in self.df.columns:
+        col = args[0]
+        if self.verbose:
+            print(f"🍄 Hipnoseta: Creando columna de cuadrados de '{col}'")
+
+        if self.df is None:
+            raise ValueError("No hay ningún archivo cargado. Usa: Sol \"archivo.csv\"")
+
+        columnas = self._columnas()
+        if col not in columnas:
             raise ValueError(f"La columna '{col}' no existe. Columnas disponibles: {list(self.df.columns)}")
-        
-        # Verificar que la columna sea numérica
-        if not pd.api.types.is_numeric_dtype(self.df[col]):
+
+        # Verificar que la columna sea numérica (lookup en el cache)
+        if not self._numeric[col]:
             raise ValueError(f"La columna '{col}' no es numérica")
-        
-        # Crear nueva columna con los cuadrados
+
+        # Crear nueva columna con los cuadrados (núcleo sobre el ndarray crudo)
         new_col_name = f"{col}_cuadrado"
-        if new_col_name in self.df.columns:
-            self.df[new_col_name] = self.df[new_col_name] + self.df[col] ** 2
+        a = self.df[col].to_numpy()
+        # El cuadrado desborda los dtypes compactados (52000² ya no cabe ni
+        # en int32): los enteros se ensanchan a int64 antes del núcleo, el
+        # mismo dtype en que llegaban de read_csv antes de compactar
+        if a.dtype.kind in "iu" and a.dtype.itemsize < 8:
+            a = a.astype(np.int64)
+        if new_col_name in columnas:
+            # Cuadrado y acumulación fusionados en una sola pasada
+            existente = self.df[new_col_name].to_numpy()
+            out = np.empty(a.shape[0], dtype=np.result_type(a, existente))
+            a = a.astype(out.dtype, copy=False)
+            existente = existente.astype(out.dtype, copy=False)
+            _cuadrado_acumular(a, existente, out)
+            self.df[new_col_name] = out
         else:
-            self.df[new_col_name] = self.df[col] ** 2
+            self.df[new_col_name] = _cuadrado_kernel(a)
+        self._cols_set = columnas | {new_col_name}
+        self._numeric[new_col_name] = True
         self.modified = True
-        
-        print(f"✅ Nueva columna '{new_col_name}' creada:")
-        print(self.df[[col, new_col_name]].head())
+
+        if self.verbose:
+            print(f"✅ Nueva columna '{new_col_name}' creada:")
+            print(self.df[[col, new_col_name]].head())
         return self.df
     
     def petacereza(self, args):
-        col = str(args[0])
-        print(f"🍒 Petacereza: Filtrando solo el Top 10 de '{col}'")
-        
-        if col not in self.df.columns:
+        col = args[0]
+        if self.verbose:
+            print(f"🍒 Petacereza: Filtrando solo el Top 10 de '{col}'")
+
+        if self.df is None:
+            raise ValueError("No hay ningún archivo cargado. Usa: Sol \"archivo.csv\"")
+
+        if col not in self._columnas():
             raise ValueError(f"La columna '{col}' no existe. Columnas disponibles: {list(self.df.columns)}")
-        
-        # Verificar que la columna sea numérica
-        if not pd.api.types.is_numeric_dtype(self.df[col]):
+
+        # Verificar que la columna sea numérica (lookup en el cache)
+        if not self._numeric[col]:
             raise ValueError(f"La columna '{col}' no es numérica")
-        
+
         if len(self.df) == 0:
             raise ValueError("El DataFrame está vacío, no se puede filtrar")
         
-        # Mantener solo el top 10
+        # Mantener solo el top 10: argpartition hace una selección O(n) de
+        # los k mayores y solo esos k se ordenan después, en lugar del
+        # ordenamiento completo que esconde nlargest. Se particiona sobre
+        # los valores originales (argpartition(vals, -k) + argsort invertido)
+        # para no pagar la copia negada del array que exigiría trabajar
+        # con -vals
         n_rows = min(10, len(self.df))
-        self.df = self.df.nlargest(n_rows, col)
+        vals = self.df[col].to_numpy()
+        if vals.dtype.kind == "f":
+            # Los NaN comparan como "mayores" en argpartition: se seleccionan
+            # los k mayores solo entre los válidos y, si no llegan a n_rows,
+            # se rellena al final con filas NaN — nlargest los ordena al
+            # final pero también devuelve n filas, así que el recuento de
+            # filas coincide con el del baseline
+            validos = np.flatnonzero(~np.isnan(vals))
+            k = min(n_rows, validos.size)
+            idx = validos[np.argpartition(vals[validos], -k)[-k:]] if k else validos
+            top = idx[np.argsort(vals[idx])[::-1]]
+            if top.size < n_rows:
+                nan_idx = np.flatnonzero(np.isnan(vals))[:n_rows - top.size]
+                top = np.concatenate([top, nan_idx])
+        else:
+            k = n_rows
+            idx = np.argpartition(vals, -k)[-k:]
+            top = idx[np.argsort(vals[idx])[::-1]]
+        self.df = self.df.iloc[top]
+        # Filtrar filas no cambia las columnas: se revalida el cache sin
+        # reconstruirlo aunque la reasignación haya subido la versión
+        self._cache_version = self.ctx.version
         self.modified = True
-        
-        print(f"✅ DataFrame reducido al Top {n_rows} de '{col}':")
-        print(self.df)
+
+        if self.verbose:
+            print(f"✅ DataFrame reducido al Top {n_rows} de '{col}':")
+            print(self.df)
         return self.df
     
     def jalapeno(self, args):
-        col = str(args[0])
-        print(f"🌶️ Jalapeño: Eliminando columna '{col}'")
-        
-        if col not in self.df.columns:
+        col = args[0]
+        if self.verbose:
+            print(f"🌶️ Jalapeño: Eliminando columna '{col}'")
+
+        if self.df is None:
+            raise ValueError("No hay ningún archivo cargado. Usa: Sol \"archivo.csv\"")
+
+        columnas = self._columnas()
+        if col not in columnas:
             raise ValueError(f"La columna '{col}' no existe. Columnas disponibles: {list(self.df.columns)}")
-        
-        if len(self.df.columns) == 1:
+
+        if len(columnas) == 1:
             raise ValueError("No se puede eliminar la única columna del DataFrame")
-        
-        self.df = self.df.drop(columns=[col])
+
+        # del en lugar de drop: desengancha la columna directamente del
+        # gestor de bloques sin pasar por la maquinaria de drop (validación
+        # de ejes/niveles y posible copia de bloques supervivientes según la
+        # disposición interna). El intérprete es dueño del DataFrame de la
+        # sesión (compartido vía ContextoDF), así que mutarlo es seguro.
+        del self.df[col]
+        self._cols_set = columnas - {col}
+        self._numeric.pop(col, None)
         self.modified = True
-        
-        print(f"✅ Columna '{col}' eliminada. Columnas restantes:")
-        print(list(self.df.columns))
+
+        if self.verbose:
+            print(f"✅ Columna '{col}' eliminada. Columnas restantes:")
+            print(list(self.df.columns))
         return self.df
     
     def COLUMN(self, token):
-        return token.value
+        # Internar el nombre: los mismos nombres de columna se repiten en
+        # cada comando y el intern los reduce a una única instancia, así los
+        # lookups en _cols_set/_numeric comparan por identidad de puntero
+        # antes de llegar al hash completo de la cadena
+        return sys.intern(token.value)
+
+# Tabla de despacho regla→método precalculada: para una gramática de una
+# producción por comando, Transformer.transform recorre el árbol y resuelve
+# cada callback con getattr por nodo; el dict de métodos sin ligar reduce
+# todo eso a un lookup más una llamada directa (el Transformer sigue
+# existiendo para los consumidores que componen gramáticas, como app.py).
+_DISPATCH = {
+    "maceta": DataFrameInterpreter.maceta,
+    "hipnoseta": DataFrameInterpreter.hipnoseta,
+    "petacereza": DataFrameInterpreter.petacereza,
+    "jalapeno": DataFrameInterpreter.jalapeno,
+}
 
 # ---------------------------
 # Función principal
 # ---------------------------
+def _guardar_atomico(df, ruta):
+    """Escribe el CSV en un temporal y lo renombra sobre el destino:
+    os.replace es atómico, así que nunca queda un archivo a medio escribir
+    aunque el proceso muera durante la serialización"""
+    tmp = ruta + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, ruta)
+    if _PARQUET:
+        # Copia de trabajo columnar junto al CSV: se escribe sin el coste de
+        # serializar números a texto y la siguiente sesión la cargará en su
+        # lugar (zstd comprime bien valores numéricos repetitivos)
+        ruta_pq = os.path.splitext(ruta)[0] + ".parquet"
+        tmp_pq = ruta_pq + ".tmp"
+        df.to_parquet(tmp_pq, engine="pyarrow", compression="zstd")
+        os.replace(tmp_pq, ruta_pq)
+
 def main():
     print("="*60)
     print("🌿 PUMA - Purosesuyutiritimakurotometa 🌱")
@@ -161,9 +473,24 @@ def main():
     
     # Cargar el DataFrame desde el CSV
     CSV_FILE = 'datos_prueba.csv'
-    
+    PARQUET_FILE = 'datos_prueba.parquet'
+
     try:
-        df = pd.read_csv(CSV_FILE)
+        # Si una sesión anterior dejó la copia de trabajo en Parquet y el CSV
+        # no ha cambiado desde entonces, cargarla evita todo el parseo de
+        # texto de read_csv (decodificación binaria directa por columnas).
+        # Un CSV más reciente indica edición externa y manda él.
+        if (_PARQUET and os.path.exists(PARQUET_FILE)
+                and os.path.getmtime(PARQUET_FILE) >= os.path.getmtime(CSV_FILE)):
+            df = pd.read_parquet(PARQUET_FILE, engine="pyarrow")
+        # Archivos grandes: leer por bloques de filas acota la memoria pico
+        # del parseo (cada bloque libera su buffer de texto antes del
+        # siguiente) y concat ensambla las columnas una sola vez al final
+        elif os.path.getsize(CSV_FILE) > 100 * 1024 * 1024:
+            with pd.read_csv(CSV_FILE, chunksize=50_000) as lector:
+                df = pd.concat(lector, ignore_index=True)
+        else:
+            df = pd.read_csv(CSV_FILE)
         print("✅ CSV cargado exitosamente!")
     except FileNotFoundError:
         print("❌ Error: No se encontró el archivo 'datos_prueba.csv'")
@@ -178,7 +505,32 @@ def main():
     except Exception as e:
         print(f"❌ Error inesperado al cargar el CSV: {e}")
         return
-    
+
+    # Compactar los dtypes numéricos: read_csv trae int64/float64 por
+    # defecto y el menor dtype suficiente reduce los bytes por elemento que
+    # mueven Maceta/Hipnoseta/Petacereza (el cuello es ancho de banda)
+    cambios = []
+    for c in df.columns:
+        serie = df[c]
+        if pd.api.types.is_integer_dtype(serie):
+            nueva = pd.to_numeric(serie, downcast="integer")
+            # Suelo en int32: los núcleos calculan en el dtype de entrada y
+            # con int8/int16 las sumas envuelven en silencio (35+35 aún cabe,
+            # pero edad+salario ya no cabe en int8). int32 conserva la mitad
+            # del ahorro de ancho de banda sin corromper la aritmética de
+            # estos rangos.
+            if nueva.dtype.itemsize < 4:
+                nueva = nueva.astype(np.int32)
+        elif pd.api.types.is_float_dtype(serie):
+            nueva = pd.to_numeric(serie, downcast="float")
+        else:
+            continue
+        if nueva.dtype != serie.dtype:
+            cambios.append(f"{c}: {serie.dtype}→{nueva.dtype}")
+            df[c] = nueva
+    if cambios:
+        print("🔻 Dtypes compactados: " + ", ".join(cambios))
+
     print("\n📊 DataFrame inicial:")
     print(df)
     print(f"\n📋 Columnas disponibles: {list(df.columns)}")
@@ -195,16 +547,53 @@ def main():
     print("  • Jalapeño columna    - Eliminar columna")
     print("  • mostrar             - Ver DataFrame actual")
     print("  • columnas            - Ver lista de columnas")
-    print("  • salir               - Terminar")
+    print("  • guardar             - Guardar cambios en el CSV")
+    print("  • salir               - Terminar (guarda si hay cambios)")
     print()
-    
+
+    # Intérprete construido una sola vez fuera del bucle: cada construcción
+    # encadenaba la del ContextoDF y re-registraba los métodos del
+    # Transformer. Entre comandos solo se actualiza la referencia al
+    # DataFrame y se resetea la bandera de modificación.
+    interpreter = DataFrameInterpreter(df)
+
+    # Persistencia diferida: reescribir el CSV entero tras cada comando era
+    # E/S O(filas) por pulsación; la bandera dirty pospone la escritura a
+    # 'guardar'/'salir', donde se hace una sola vez y de forma atómica.
+    # Como salvaguarda ante caídas, cada _BATCH modificaciones acumuladas
+    # fuerzan un volcado automático: una sesión larga nunca arriesga más de
+    # _BATCH comandos de trabajo y el coste de E/S sigue siendo 1/_BATCH
+    # del volcado por comando original.
+    _BATCH = 25
+    dirty = False
+    pendientes = 0
+
+    def _volcar_si_dirty():
+        nonlocal dirty, pendientes
+        if not dirty:
+            return
+        try:
+            _guardar_atomico(df, CSV_FILE)
+            print(f"💾 Cambios guardados en '{CSV_FILE}'")
+            dirty = False
+            pendientes = 0
+        except PermissionError:
+            print(f"⚠️ Error: No se puede guardar '{CSV_FILE}' (archivo abierto en otro programa)")
+        except Exception as e:
+            print(f"⚠️ Error al guardar: {e}")
+
     while True:
         try:
             comando = input("🌿 > ").strip()
-            
+
             if comando.lower() in ['salir', 'exit', 'quit']:
+                _volcar_si_dirty()
                 print("👋 ¡Hasta luego!")
                 break
+
+            if comando.lower() == 'guardar':
+                _volcar_si_dirty()
+                continue
             
             if not comando:
                 continue
@@ -229,11 +618,24 @@ def main():
             
             print(f"💻 Ejecutando: {comando!r}\n")
             
-            # 1️⃣ Fase léxica
+            # 1️⃣ Fase léxica (solo diagnóstico: el lexer de Lark hace la
+            # única pasada léxica real dentro de parse())
+            if DEBUG:
+                try:
+                    tokenize(comando)
+                except SyntaxError:
+                    pass  # parse() reporta el error léxico a continuación
+
+            # 2️⃣ Fase sintáctica
             try:
-                tokens = tokenize(comando)
-            except SyntaxError as e:
-                print(f"❌ Error léxico: {e}")
+                tree = _cached_parse(comando)
+                # Resumen de una línea: O(tokens del comando) frente a
+                # tree.pretty(), que recorre y formatea el árbol completo
+                sub = tree.children[0]
+                print(f"✅ Árbol sintáctico: {sub.data}("
+                      f"{', '.join(str(c) for c in sub.children)})\n")
+            except UnexpectedCharacters as e:
+                print(f"❌ Error léxico: Carácter inesperado en posición {e.pos_in_stream}")
                 print("💡 Comandos válidos:")
                 print("   • Maceta columna1 columna2")
                 print("   • Hipnoseta columna")
@@ -242,13 +644,6 @@ def main():
                 print("="*60)
                 print()
                 continue
-            
-            # 2️⃣ Fase sintáctica
-            try:
-                tree = parser.parse(comando)
-                print("✅ Árbol sintáctico:")
-                print(tree.pretty())
-                print()
             except UnexpectedToken as e:
                 print(f"❌ Error sintáctico: Token inesperado '{e.token}'")
                 print("💡 Verifica que el comando esté bien escrito")
@@ -269,22 +664,31 @@ def main():
             
             # 3️⃣ Fase de interpretación
             try:
-                interpreter = DataFrameInterpreter(df)
-                result = interpreter.transform(tree)
+                # Reasignar solo si la referencia cambió: el setter del
+                # contexto incrementa el contador de versión y no hay por
+                # qué pagarlo (ni invalidar cachés) en cada comando
+                if interpreter.df is not df:
+                    interpreter.df = df
+                interpreter.modified = False
+                # Despacho directo por la tabla regla→método, saltándose el
+                # recorrido de Transformer.transform. Como no pasan por los
+                # callbacks, los tokens COLUMN se internan aquí (el mismo
+                # trabajo que haría el callback COLUMN del Transformer).
+                args = [sys.intern(t.value) for t in sub.children]
+                _DISPATCH[sub.data](interpreter, args)
                 
-                # Si se modificó el DataFrame, actualizar y guardar
+                # Si se modificó el DataFrame, marcar para la escritura
+                # diferida (la persistencia real ocurre en 'guardar'/'salir')
                 if interpreter.modified:
                     df = interpreter.df
-                    try:
-                        df.to_csv(CSV_FILE, index=False)
-                        print(f"\n💾 Cambios guardados en '{CSV_FILE}'")
-                    except PermissionError:
-                        print(f"\n⚠️ Error: No se puede guardar '{CSV_FILE}' (archivo abierto en otro programa)")
-                    except Exception as e:
-                        print(f"\n⚠️ Error al guardar: {e}")
-                    
+                    dirty = True
+                    pendientes += 1
+
                     print("\n📊 DataFrame actualizado:")
                     print(df)
+
+                    if pendientes >= _BATCH:
+                        _volcar_si_dirty()
                 
                 print("="*60)
                 print()
@@ -308,9 +712,12 @@ def main():
         
         except KeyboardInterrupt:
             print("\n\n👋 Programa interrumpido por el usuario")
+            _volcar_si_dirty()
             break
         except EOFError:
-            print("\n👋 ¡Hasta luego!")
+            print()
+            _volcar_si_dirty()
+            print("👋 ¡Hasta luego!")
             break
         except Exception as e:
             print(f"❌ Error inesperado: {e}")